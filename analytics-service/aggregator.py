@@ -0,0 +1,117 @@
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set
+from collections import defaultdict
+
+from lap_features import compute_lap_features
+from instrumentation import timed
+
+
+LAP_COMPLETION_THRESHOLD = int(os.getenv('LAP_COMPLETION_THRESHOLD', '10')) 
+
+
+def parse_telemetry_payload(payload: bytes) -> Optional[Dict]:
+    try:
+        data = json.loads(payload)
+    except Exception as e:
+        return None
+    
+    if not isinstance(data, dict):
+        return None
+    
+    if 'lapNumber' in data:
+        data['lap_number'] = data['lapNumber']
+    
+    if 'driver' not in data or 'lap_number' not in data:
+        return None
+    
+    return data
+
+
+class TelemetryAggregator:
+    def __init__(self):
+        self.lap_data = defaultdict(lambda: defaultdict(list))
+        self.last_update = defaultdict(float)
+        self.completed_laps = []
+        # Last datamanager row id seen per driver, used to resume after a restart
+        self.last_ids: Dict[str, int] = {}
+        # Live MQTT and the datamanager replay after a restart can deliver the same row twice:
+        # ids already in an open lap, or covered by the restored checkpoint, are skipped
+        self.lap_ids: Dict[str, Set[int]] = defaultdict(set)
+        self.restored_ids: Dict[str, int] = {}
+        
+    @timed("analytics_add_telemetry_seconds", "TelemetryAggregator.add_telemetry time per sample")
+    def add_telemetry(self, data: Dict):
+        if 'driver' not in data or 'lap_number' not in data:
+            return
+            
+        key = f"{data['driver']}_{data['lap_number']}"
+        
+        sample_id = data.get('id')
+        if isinstance(sample_id, int):
+            if sample_id <= self.restored_ids.get(data['driver'], 0) or sample_id in self.lap_ids[key]:
+                return
+            self.lap_ids[key].add(sample_id)
+        
+        self.lap_data[key]['driver'] = data['driver']
+        self.lap_data[key]['lap_number'] = data['lap_number']
+        
+        if 'speed' in data:
+            self.lap_data[key]['speed'].append(data['speed'])
+        if 'throttle' in data:
+            self.lap_data[key]['throttle'].append(data['throttle'])
+        if 'brake' in data:
+            self.lap_data[key]['brake'].append(1 if data['brake'] else 0)
+        if 'nGear' in data: 
+            self.lap_data[key]['n_gear'].append(data['nGear'])
+        if 'rpm' in data:
+            self.lap_data[key]['rpm'].append(data['rpm'])
+        if 'drs' in data:
+            self.lap_data[key]['drs'].append(1 if data['drs'] else 0)
+        if 'x' in data:
+            self.lap_data[key]['x'].append(data['x'])
+        if 'y' in data:
+            self.lap_data[key]['y'].append(data['y'])
+        if isinstance(data.get('id'), int) and data['id'] > self.last_ids.get(data['driver'], 0):
+            self.last_ids[data['driver']] = data['id']
+        
+        self.touch(key)
+        
+    def touch(self, key: str):
+        self.last_update[key] = time.time()
+        
+    def check_completed_laps(self):
+        current_time = time.time()
+        completed = []
+        
+        for key, last_time in list(self.last_update.items()):
+            if current_time - last_time > LAP_COMPLETION_THRESHOLD:
+                if key in self.lap_data and len(self.lap_data[key]['speed']) > 10:
+                    lap_summary = self._aggregate_lap_data(self.lap_data[key])
+                    completed.append(lap_summary)
+                    
+                    del self.lap_data[key]
+                    del self.last_update[key]
+                    self.lap_ids.pop(key, None)
+                    
+        return completed
+    
+    def _aggregate_lap_data(self, lap_data: Dict) -> Dict:
+        features = compute_lap_features(lap_data)
+        
+        return {
+            'driver': lap_data['driver'],
+            'lap_number': lap_data['lap_number'],
+            'speed': features['Speed_mean'],
+            'throttle': features['Throttle_mean'],
+            'brake': features['Brake_sum'] > 0,
+            'n_gear': int(features['nGear_mean']),
+            'rpm': features['RPM_mean'],
+            'drs': features['DRS_sum'] > 0,
+            'x': features['X_mean'],
+            'y': features['Y_mean'],
+            'features': features,
+            'timestamp': datetime.now().isoformat()
+        }
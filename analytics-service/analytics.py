@@ -1,7 +1,9 @@
 import os
+import sys
 import json
 import logging
 import asyncio
+import pathlib
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
@@ -10,10 +12,23 @@ import requests
 import paho.mqtt.client as mqtt
 import nats
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import uvicorn
-import threading
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent.joinpath("shared")))
+import instrumentation
+import profiling
+from instrumentation import counter, inject_headers, payload_context, span, with_trace_context
+
+from aggregator import TelemetryAggregator, parse_telemetry_payload
+from prediction_store import PredictionStore
+from prediction_publisher import PredictionPublisher
+from lap_features import DriverBaselines, feature_vector
+from workers import ShardRouter, shard_for
+from lap_checkpoint import CHECKPOINT_INTERVAL, LapCheckpoint, checkpoint_path, reshard_checkpoints
+from datamanager_replay import fetch_missing_payloads
 
 
 load_dotenv()
@@ -29,10 +44,24 @@ MQTT_CLIENT_ID = os.getenv('MQTT_CLIENT_ID', 'analytics-service')
 
 NATS_URL = os.getenv('NATS_URL', 'nats://nats:4222')
 NATS_TOPIC = os.getenv('NATS_TOPIC', 'telemetry.predictions')
+NATS_FLUSH_TIMEOUT = float(os.getenv('NATS_FLUSH_TIMEOUT', '5'))
 
 MLAAS_URL = os.getenv('MLAAS_URL', 'http://mlaas:8000')
 
-LAP_COMPLETION_THRESHOLD = int(os.getenv('LAP_COMPLETION_THRESHOLD', '10')) 
+PREDICTIONS_MAX = int(os.getenv('PREDICTIONS_MAX', '10000'))
+PREDICTIONS_SPILL_PATH = os.getenv('PREDICTIONS_SPILL_PATH') or None
+PREDICTIONS_DEFAULT_LIMIT = int(os.getenv('PREDICTIONS_DEFAULT_LIMIT', '500'))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', '15'))
+STREAM_MAX_PENDING = int(os.getenv('STREAM_MAX_PENDING', '1000'))
+
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '100000'))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+API_PORT = int(os.getenv('API_PORT', '8080'))
+ANALYTICS_WORKERS = int(os.getenv('ANALYTICS_WORKERS', '1'))
+
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR') or None
+REPLAY_FROM_DATAMANAGER = os.getenv('REPLAY_FROM_DATAMANAGER', 'false').lower() == 'true'
+DATAMANAGER_ADDR = os.getenv('DATAMANAGER_ADDR', 'datamanager:50051')
 
 app = FastAPI(title="Analytics Service API", version="1.0.0")
 
@@ -44,88 +73,122 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-recent_predictions = []
-all_predictions = [] 
-max_recent = 50 
+prediction_store = PredictionStore(capacity=PREDICTIONS_MAX, spill_path=PREDICTIONS_SPILL_PATH)
+
+PREDICTION_ERRORS = counter("analytics_prediction_errors_total", "MLaaS prediction calls that failed")
+PUBLISH_ERRORS = counter("analytics_publish_errors_total", "Predictions that could not be stored or published")
+LAP_LOOP_ERRORS = counter("analytics_lap_loop_errors_total", "Completed-lap processing rounds that raised")
 
 @app.get("/predictions")
-async def get_predictions():
+async def get_predictions(
+    driver: Optional[str] = None,
+    lap_min: Optional[int] = None,
+    lap_max: Optional[int] = None,
+    since: Optional[datetime] = None,
+    since_seq: Optional[int] = None,
+    limit: int = Query(PREDICTIONS_DEFAULT_LIMIT, ge=1, le=PREDICTIONS_MAX)
+):
+    predictions = prediction_store.query(
+        driver=driver,
+        lap_min=lap_min,
+        lap_max=lap_max,
+        since=since,
+        since_seq=since_seq,
+        limit=limit
+    )
     return {
         "status": "success",
-        "predictions": all_predictions, 
-        "total": len(all_predictions)
+        "predictions": predictions, 
+        "total": len(predictions),
+        "stored": len(prediction_store),
+        "last_seq": prediction_store.last_seq
     }
 
+def format_sse(message: Dict) -> str:
+    return f"id: {message['seq']}\nevent: prediction\ndata: {json.dumps(message)}\n\n"
+
+@app.get("/predictions/stream")
+async def stream_predictions(
+    request: Request,
+    drivers: Optional[List[str]] = Query(None, alias="driver"),
+    last_seq: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    resume_from = last_seq
+    if last_event_id and last_event_id.isdigit():
+        resume_from = max(resume_from or 0, int(last_event_id))
+    driver_filter = set(drivers) if drivers else None
+
+    live_from = prediction_store.last_seq
+    subscription = prediction_store.subscribe(asyncio.get_running_loop(), STREAM_MAX_PENDING)
+
+    async def events():
+        try:
+            sent_seq = resume_from if resume_from is not None else live_from
+            if resume_from is not None:
+                for message in prediction_store.query(since_seq=resume_from):
+                    if driver_filter is None or message['driver'] in driver_filter:
+                        yield format_sse(message)
+                    sent_seq = message['seq']
+
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if message is None:
+                    break
+                if message['seq'] <= sent_seq:
+                    continue
+                sent_seq = message['seq']
+                if driver_filter is None or message['driver'] in driver_filter:
+                    yield format_sse(message)
+        finally:
+            prediction_store.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/predictions/{driver}/{lap_number}")
+async def get_lap_prediction(driver: str, lap_number: int):
+    prediction = prediction_store.get_lap(driver, lap_number)
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return {"status": "success", "prediction": prediction}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "analytics"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return instrumentation.render_prometheus()
 
-class TelemetryAggregator:
-    def __init__(self):
-        self.lap_data = defaultdict(lambda: defaultdict(list))
-        self.last_update = defaultdict(float)
-        self.completed_laps = []
-        
-    def add_telemetry(self, data: Dict):
-        if 'driver' not in data or 'lap_number' not in data:
-            return
-            
-        key = f"{data['driver']}_{data['lap_number']}"
-        
-        self.lap_data[key]['driver'] = data['driver']
-        self.lap_data[key]['lap_number'] = data['lap_number']
-        
-        if 'speed' in data:
-            self.lap_data[key]['speed'].append(data['speed'])
-        if 'throttle' in data:
-            self.lap_data[key]['throttle'].append(data['throttle'])
-        if 'brake' in data:
-            self.lap_data[key]['brake'].append(1 if data['brake'] else 0)
-        if 'nGear' in data: 
-            self.lap_data[key]['n_gear'].append(data['nGear'])
-        if 'rpm' in data:
-            self.lap_data[key]['rpm'].append(data['rpm'])
-        if 'drs' in data:
-            self.lap_data[key]['drs'].append(1 if data['drs'] else 0)
-        if 'x' in data:
-            self.lap_data[key]['x'].append(data['x'])
-        if 'y' in data:
-            self.lap_data[key]['y'].append(data['y'])
-        
-        self.last_update[key] = time.time()
-        
-    def check_completed_laps(self):
-        current_time = time.time()
-        completed = []
-        
-        for key, last_time in list(self.last_update.items()):
-            if current_time - last_time > LAP_COMPLETION_THRESHOLD:
-                if key in self.lap_data and len(self.lap_data[key]['speed']) > 10:
-                    lap_summary = self._aggregate_lap_data(self.lap_data[key])
-                    completed.append(lap_summary)
-                    
-                    del self.lap_data[key]
-                    del self.last_update[key]
-                    
-        return completed
-    
-    def _aggregate_lap_data(self, lap_data: Dict) -> Dict:
-        import numpy as np
-        
-        return {
-            'driver': lap_data['driver'],
-            'lap_number': lap_data['lap_number'],
-            'speed': float(np.mean(lap_data['speed'])),
-            'throttle': float(np.mean(lap_data['throttle'])),
-            'brake': bool(np.sum(lap_data['brake']) > 0),
-            'n_gear': int(np.mean(lap_data['n_gear'])),
-            'rpm': float(np.mean(lap_data['rpm'])),
-            'drs': bool(np.sum(lap_data['drs']) > 0),
-            'x': float(np.mean(lap_data['x'])),
-            'y': float(np.mean(lap_data['y'])),
-            'timestamp': datetime.now().isoformat()
-        }
+@app.get("/debug/profile/{kind}", response_class=PlainTextResponse, include_in_schema=False)
+async def get_profile(kind: str, request: Request):
+    """Folded CPU or allocation profile of this process, when PROFILING_ENABLED=true"""
+    status, body, headers = await asyncio.to_thread(profiling.handle_request, f"{request.url.path}?{request.url.query}")
+    return PlainTextResponse(body, status_code=status, headers=headers)
+
+@app.get("/stats")
+async def get_stats():
+    stats = {
+        "status": "success",
+        "ingest": service.ingest_stats(),
+        "open_laps": service.open_laps(),
+        "predictions_stored": len(prediction_store),
+        "last_seq": prediction_store.last_seq
+    }
+    if service.publisher:
+        stats["nats"] = service.publisher.stats()
+    if service.router:
+        stats["workers"] = service.router.stats()
+    return stats
 
 
 class AnalyticsService:
@@ -133,35 +196,75 @@ class AnalyticsService:
     def __init__(self):
         self.mqtt_client = None
         self.nats_client = None
+        self.publisher: Optional[PredictionPublisher] = None
         self.aggregator = TelemetryAggregator()
         self.is_running = False
         self.mlaas_available = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.ingest_queue: Optional[asyncio.Queue] = None
+        self.ingest_counters = defaultdict(int)
+        self.tasks: List[asyncio.Task] = []
+        self.router: Optional[ShardRouter] = None
+        self.checkpoint: Optional[LapCheckpoint] = None
+        self.feature_schema: Optional[Dict] = None
+        # Driver baselines are kept here rather than per shard, so every lap of a driver folds into one baseline
+        self.baselines = DriverBaselines()
+        self.seeded_baselines: Optional[Dict] = None
         
     async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.ingest_queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+        
         await self.check_mlaas_health()
         
+        # Open laps from the previous run are spread over the checkpoint files of the current shards
+        last_ids = {}
+        if CHECKPOINT_DIR:
+            last_ids = reshard_checkpoints(CHECKPOINT_DIR, max(1, ANALYTICS_WORKERS), shard_for)
+        
+        # With more than one worker, lap aggregation runs in driver-sharded worker processes
+        if ANALYTICS_WORKERS > 1:
+            self.router = ShardRouter(ANALYTICS_WORKERS, CHECKPOINT_DIR)
+            self.router.start()
+        elif CHECKPOINT_DIR:
+            self.checkpoint = LapCheckpoint(checkpoint_path(CHECKPOINT_DIR, 0))
+            self.checkpoint.restore(self.aggregator)
+        
         self.setup_mqtt()
         
         await self.setup_nats()
         
         self.is_running = True
         
-        asyncio.create_task(self.process_completed_laps())
-        asyncio.create_task(self.health_check_loop())
-        
-        try:
-            while self.is_running:
-                await asyncio.sleep(1)
-        except KeyboardInterrupt:
-            await self.stop()
+        self.tasks = [
+            asyncio.create_task(self.consume_ingest_queue()),
+            asyncio.create_task(self.process_completed_laps()),
+            asyncio.create_task(self.health_check_loop())
+        ]
+        if self.checkpoint:
+            self.tasks.append(asyncio.create_task(self.checkpoint_loop()))
+        if REPLAY_FROM_DATAMANAGER and last_ids:
+            self.tasks.append(asyncio.create_task(self.replay_missing(last_ids)))
             
     async def stop(self):
         self.is_running = False
         
+        for task in self.tasks:
+            task.cancel()
+        
+        if self.router:
+            self.router.stop()
+        
+        if self.checkpoint:
+            self.checkpoint.checkpoint(self.aggregator)
+        
         if self.mqtt_client:
             self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
             
+        if self.publisher:
+            await self.publisher.close()
+            
         if self.nats_client and not self.nats_client.is_closed:
             await self.nats_client.close()
             
@@ -180,6 +283,8 @@ class AnalyticsService:
     async def setup_nats(self):
         try:
             self.nats_client = await nats.connect(NATS_URL)
+            self.publisher = PredictionPublisher(self.nats_client, NATS_TOPIC)
+            await self.publisher.start()
         except Exception as e:
             raise
             
@@ -193,40 +298,132 @@ class AnalyticsService:
         pass
         
     def on_mqtt_message(self, client, userdata, msg):
+        # Runs on the paho network thread: only hand the payload over to the event loop
         try:
-            data = json.loads(msg.payload.decode())
+            self.loop.call_soon_threadsafe(self.enqueue_payload, msg.payload)
+        except RuntimeError:
+            pass
+            
+    def enqueue_payload(self, payload: bytes):
+        self.ingest_counters['received'] += 1
+        try:
+            self.ingest_queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.ingest_counters['dropped'] += 1
             
-            if 'lapNumber' in data:
-                data['lap_number'] = data['lapNumber']
+    def ingest_stats(self) -> Dict:
+        return {
+            "queue_size": self.ingest_queue.qsize() if self.ingest_queue else 0,
+            "queue_capacity": INGEST_QUEUE_SIZE,
+            "received": self.ingest_counters['received'],
+            "processed": self.ingest_counters['processed'],
+            "dropped": self.ingest_counters['dropped'],
+            "invalid": self.ingest_counters['invalid'],
+            "replayed": self.ingest_counters['replayed']
+        }
             
-            if 'driver' not in data or 'lap_number' not in data:
-                return
+    def open_laps(self) -> int:
+        if self.router:
+            return sum(stats.get('open_laps', 0) for stats in self.router.worker_stats.values())
+        return len(self.aggregator.lap_data)
             
+    def handle_payload(self, payload: bytes):
+        if self.router:
+            if self.router.route(payload):
+                self.ingest_counters['processed'] += 1
+            else:
+                self.ingest_counters['invalid'] += 1
+            return
+        
+        data = parse_telemetry_payload(payload)
+        if data is None:
+            self.ingest_counters['invalid'] += 1
+            return
+        
+        with span("add_telemetry", parent=payload_context(data)):
             self.aggregator.add_telemetry(data)
+        self.ingest_counters['processed'] += 1
+            
+    async def consume_ingest_queue(self):
+        while self.is_running:
+            payload = await self.ingest_queue.get()
+            self.handle_payload(payload)
+            
+            # Drain whatever else is queued in one go, then yield to the API and other tasks
+            for _ in range(INGEST_BATCH_SIZE - 1):
+                try:
+                    payload = self.ingest_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                self.handle_payload(payload)
+                
+            if self.router:
+                self.router.flush()
+                
+            await asyncio.sleep(0)
             
+    async def checkpoint_loop(self):
+        while self.is_running:
+            await asyncio.sleep(CHECKPOINT_INTERVAL)
+            try:
+                self.checkpoint.checkpoint(self.aggregator)
+            except Exception as e:
+                pass
+            
+    async def replay_missing(self, last_ids: Dict[str, int]):
+        # Samples published while the service was down are not redelivered by MQTT
+        try:
+            payloads = await asyncio.to_thread(fetch_missing_payloads, DATAMANAGER_ADDR, last_ids)
         except Exception as e:
-            pass
+            return
+        
+        self.ingest_counters['replayed'] += len(payloads)
+        for start in range(0, len(payloads), INGEST_BATCH_SIZE):
+            for payload in payloads[start:start + INGEST_BATCH_SIZE]:
+                self.handle_payload(payload)
+            if self.router:
+                self.router.flush()
+            await asyncio.sleep(0)
             
     async def process_completed_laps(self):
         while self.is_running:
             try:
-                completed_laps = self.aggregator.check_completed_laps()
+                if self.router:
+                    completed_laps = self.router.drain_completed()
+                else:
+                    completed_laps = self.aggregator.check_completed_laps()
                 
                 for lap_data in completed_laps:
+                    lap_data['features'].update(self.baselines.add_lap(lap_data['driver'], lap_data['features']))
                     prediction = await self.get_lap_prediction(lap_data)
                     
                     if prediction:
                         await self.publish_prediction(lap_data, prediction)
+                
+                # One flush per batch of laps rather than per message
+                if completed_laps and self.publisher:
+                    await self.publisher.flush(timeout=NATS_FLUSH_TIMEOUT)
                         
             except Exception as e:
-                pass
+                LAP_LOOP_ERRORS.inc()
                 
             await asyncio.sleep(5)  
             
+    @instrumentation.timed("analytics_lap_prediction_seconds", "Time to get a lap prediction from MLaaS")
     async def get_lap_prediction(self, lap_data: Dict) -> Optional[Dict]:
         if not self.mlaas_available:
             return None
+        
+        with span("lap_prediction", attributes={"telemetry.driver": lap_data['driver'],
+                                                "telemetry.lap_number": lap_data['lap_number']}):
+            if self.feature_schema and 'features' in lap_data:
+                prediction = await self.get_feature_prediction(lap_data)
+                if prediction:
+                    return prediction
+            
+            return await self.get_legacy_prediction(lap_data)
             
+    async def get_legacy_prediction(self, lap_data: Dict) -> Optional[Dict]:
         try:
             request_data = {
                 'driver': lap_data['driver'],
@@ -241,18 +438,22 @@ class AnalyticsService:
                 'y': lap_data['y']
             }
             
-            response = requests.post(
+            response = await asyncio.to_thread(
+                requests.post,
                 f"{MLAAS_URL}/predict",
                 json=request_data,
+                headers=inject_headers({}),
                 timeout=5
             )
             
             if response.status_code == 200:
                 return response.json()
             else:
+                PREDICTION_ERRORS.inc()
                 return None
                 
         except Exception as e:
+            PREDICTION_ERRORS.inc()
             return None
             
     async def publish_prediction(self, lap_data: Dict, prediction: Dict):
@@ -273,30 +474,67 @@ class AnalyticsService:
                 'model_version': prediction.get('model_version', 'unknown')
             }
             
-            await self.nats_client.publish(
-                NATS_TOPIC,
-                json.dumps(message).encode()
-            )
+            prediction_store.add(message)
             
-            global recent_predictions, all_predictions
+            with span("publish_prediction", attributes={"messaging.destination": NATS_TOPIC}):
+                await self.publisher.publish(with_trace_context(message))
             
-
-            all_predictions.append(message)
+        except Exception as e:
+            PUBLISH_ERRORS.inc()
+            
+    async def get_feature_prediction(self, lap_data: Dict) -> Optional[Dict]:
+        # Full training feature set as a dense vector, in the order MLaaS asked for
+        try:
+            request_data = {
+                'driver': lap_data['driver'],
+                'lap_number': lap_data['lap_number'],
+                'feature_schema': self.feature_schema['feature_schema'],
+                'features': feature_vector(lap_data['features'], self.feature_schema['features'])
+            }
             
-            recent_predictions.append(message)
-            if len(recent_predictions) > max_recent:
-                recent_predictions = recent_predictions[-max_recent:]
+            response = await asyncio.to_thread(
+                requests.post,
+                f"{MLAAS_URL}/predict/features",
+                json=request_data,
+                headers=inject_headers({}),
+                timeout=5
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 409:
+                # Model was retrained with a different feature set
+                await self.refresh_feature_schema()
+            else:
+                PREDICTION_ERRORS.inc()
+            return None
             
         except Exception as e:
-            pass
+            PREDICTION_ERRORS.inc()
+            return None
+            
+    async def refresh_feature_schema(self):
+        try:
+            response = await asyncio.to_thread(requests.get, f"{MLAAS_URL}/model/features", timeout=5)
+            self.feature_schema = response.json() if response.status_code == 200 else None
+            baselines = (self.feature_schema or {}).get('driver_baselines')
+            if baselines is not None and baselines != self.seeded_baselines:
+                # A newly trained model: restart from the stats it was trained with
+                self.baselines.seed(baselines)
+                self.seeded_baselines = baselines
+        except Exception as e:
+            self.feature_schema = None
             
     async def check_mlaas_health(self):
         try:
-            response = requests.get(f"{MLAAS_URL}/health", timeout=5)
+            response = await asyncio.to_thread(requests.get, f"{MLAAS_URL}/health", timeout=5)
             self.mlaas_available = response.status_code == 200
                 
         except Exception as e:
             self.mlaas_available = False
+        
+        if self.mlaas_available:
+            await self.refresh_feature_schema()
             
     async def health_check_loop(self):
         while self.is_running:
@@ -304,16 +542,18 @@ class AnalyticsService:
             await asyncio.sleep(30) 
 
 
-def start_api_server():
-    uvicorn.run(app, host="0.0.0.0", port=8080, log_level="info")
+service = AnalyticsService()
 
 async def main():
-    api_thread = threading.Thread(target=start_api_server, daemon=True)
-    api_thread.start()
-    logger.info("Started FastAPI server on port 8080")
+    # The API, the ingestion consumer and the NATS client all share this event loop
+    instrumentation.init_tracing("analytics")
+    server = uvicorn.Server(uvicorn.Config(app, host="0.0.0.0", port=API_PORT, log_level="info"))
     
-    service = AnalyticsService()
     await service.start()
+    try:
+        await server.serve()
+    finally:
+        await service.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+"""
+Recovery of telemetry that arrived while the analytics service was down.
+Rows are exported from the datamanager per driver, after the last row id the
+lap checkpoint had seen, and turned back into MQTT-style payloads.
+"""
+
+import sys
+import json
+import pathlib
+from typing import Dict, List
+
+import grpc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.joinpath("gen")))
+import telemetry_pb2, telemetry_pb2_grpc
+
+
+def telemetry_to_payload(t) -> bytes:
+    """Encode a Telemetry message the same way the datamanager publishes it on MQTT"""
+    return json.dumps({
+        "id": t.id,
+        "driver": t.driver,
+        "timestampUtc": t.timestamp.ToDatetime().isoformat() + "Z",
+        "lapNumber": t.lap_number,
+        "x": t.x,
+        "y": t.y,
+        "speed": t.speed,
+        "throttle": t.throttle,
+        "brake": t.brake,
+        "nGear": t.n_gear,
+        "rpm": t.rpm,
+        "drs": t.drs
+    }).encode()
+
+
+def fetch_missing_payloads(target: str, last_ids: Dict[str, int], batch_size: int = 5000,
+                           timeout: float = 120.0) -> List[bytes]:
+    """
+    Export every row newer than the per-driver ids in last_ids.
+    Drivers missing from last_ids first appeared while the service was down; row ids are
+    global, so their rows are exported from the newest id the checkpoint had seen from anyone.
+    """
+    payloads: List[bytes] = []
+
+    with grpc.insecure_channel(target) as channel:
+        stub = telemetry_pb2_grpc.TelemetryServiceStub(channel)
+        summaries = stub.ListDrivers(telemetry_pb2.ListDriversRequest(), timeout=timeout).drivers
+        restored_up_to = max(last_ids.values(), default=0)
+
+        for summary in summaries:
+            after_id = last_ids.get(summary.driver, restored_up_to)
+            if summary.max_id <= after_id:
+                continue
+
+            request = telemetry_pb2.ExportTelemetryRequest(
+                driver_filter=summary.driver,
+                after_id=after_id,
+                batch_size=batch_size
+            )
+            for batch in stub.ExportTelemetry(request, timeout=timeout):
+                payloads.extend(telemetry_to_payload(t) for t in batch.telemetries)
+
+    return payloads
@@ -0,0 +1,233 @@
+import os
+import glob
+import json
+import struct
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+
+CHECKPOINT_INTERVAL = float(os.getenv('CHECKPOINT_INTERVAL', '5'))
+CHECKPOINT_COMPACT_BYTES = int(os.getenv('CHECKPOINT_COMPACT_BYTES', str(64 * 1024 * 1024)))
+
+LAP_FIELDS = ['speed', 'throttle', 'brake', 'n_gear', 'rpm', 'drs', 'x', 'y']
+
+# Record layout: kind (1 byte), header length (uint32), JSON header, float64 sample arrays
+RECORD_PREFIX = struct.Struct('<cI')
+SAMPLES = b'S'
+CLOSED = b'C'
+META = b'M'
+
+
+def checkpoint_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, f"laps-{shard}.ckpt")
+
+
+def encode_record(kind: bytes, header: Dict, arrays: List[List[float]] = ()) -> bytes:
+    head = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    body = b''.join(np.asarray(values, dtype='<f8').tobytes() for values in arrays)
+    return RECORD_PREFIX.pack(kind, len(head)) + head + body
+
+
+def iter_records(data: bytes) -> Iterator[Tuple[bytes, Dict, Dict[str, np.ndarray], int]]:
+    """Yield (kind, header, arrays, end offset) for each complete record, stopping at a torn tail"""
+    offset = 0
+    while offset + RECORD_PREFIX.size <= len(data):
+        kind, head_len = RECORD_PREFIX.unpack_from(data, offset)
+        head_end = offset + RECORD_PREFIX.size + head_len
+        if head_end > len(data):
+            return
+        try:
+            header = json.loads(data[offset + RECORD_PREFIX.size:head_end])
+        except ValueError:
+            return
+
+        arrays = {}
+        position = head_end
+        for field, count in header.get('counts', {}).items():
+            end = position + count * 8
+            if end > len(data):
+                return
+            arrays[field] = np.frombuffer(data, dtype='<f8', count=count, offset=position)
+            position = end
+
+        yield kind, header, arrays, position
+        offset = position
+
+
+def load_checkpoint(path: str) -> Tuple[Dict[str, Dict], Dict[str, int], int]:
+    """Replay a checkpoint log into open laps, returns (laps, last ids per driver, valid length)"""
+    laps: Dict[str, Dict] = {}
+    last_ids: Dict[str, int] = {}
+    valid_end = 0
+
+    if not os.path.exists(path):
+        return laps, last_ids, valid_end
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    for kind, header, arrays, end in iter_records(data):
+        if kind == SAMPLES:
+            key = f"{header['driver']}_{header['lap_number']}"
+            lap = laps.setdefault(key, {'driver': header['driver'], 'lap_number': header['lap_number']})
+            for field, values in arrays.items():
+                lap.setdefault(field, []).extend(values.tolist())
+        elif kind == CLOSED:
+            laps.pop(f"{header['driver']}_{header['lap_number']}", None)
+        elif kind == META:
+            last_ids.update(header.get('last_ids', {}))
+        valid_end = end
+
+    return laps, last_ids, valid_end
+
+
+class LapCheckpoint:
+    """
+    Append-only checkpoint log of the open laps in one TelemetryAggregator.
+    Each checkpoint only appends the samples added since the previous one and a
+    close marker for laps that finished; the log is compacted once it grows too large.
+    """
+
+    def __init__(self, path: str, compact_bytes: int = CHECKPOINT_COMPACT_BYTES):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._written: Dict[str, Dict[str, int]] = {}
+        self._identity: Dict[str, Tuple] = {}
+        self._last_ids: Dict[str, int] = {}
+
+    def restore(self, aggregator) -> Dict[str, int]:
+        """Load open laps from the log into the aggregator, returns the last sample id per driver"""
+        laps, last_ids, valid_end = load_checkpoint(self.path)
+
+        if os.path.exists(self.path) and os.path.getsize(self.path) > valid_end:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+
+        for key, lap in laps.items():
+            target = aggregator.lap_data[key]
+            target['driver'] = lap['driver']
+            target['lap_number'] = lap['lap_number']
+            for field in LAP_FIELDS:
+                if field in lap:
+                    target[field].extend(lap[field])
+            aggregator.touch(key)
+            self._written[key] = {field: len(lap.get(field, [])) for field in LAP_FIELDS}
+            self._identity[key] = (lap['driver'], lap['lap_number'])
+
+        aggregator.last_ids.update(last_ids)
+        aggregator.restored_ids.update(last_ids)
+        self._last_ids = dict(last_ids)
+        return last_ids
+
+    def _lap_record(self, lap: Dict, written: Dict[str, int]) -> bytes:
+        counts, arrays = {}, []
+        for field in LAP_FIELDS:
+            values = lap.get(field, [])
+            start = written.get(field, 0)
+            if len(values) > start:
+                counts[field] = len(values) - start
+                arrays.append(values[start:])
+        if not counts:
+            return b''
+        return encode_record(SAMPLES, {
+            'driver': lap['driver'],
+            'lap_number': lap['lap_number'],
+            'counts': counts
+        }, arrays)
+
+    def checkpoint(self, aggregator):
+        """Append new samples of open laps and close markers for laps that are no longer open"""
+        chunks = []
+
+        for key, lap in list(aggregator.lap_data.items()):
+            written = self._written.get(key, {})
+            record = self._lap_record(lap, written)
+            if record:
+                chunks.append(record)
+                self._written[key] = {field: len(lap.get(field, [])) for field in LAP_FIELDS}
+                self._identity[key] = (lap['driver'], lap['lap_number'])
+
+        for key in [key for key in self._written if key not in aggregator.lap_data]:
+            driver, lap_number = self._identity.pop(key)
+            chunks.append(encode_record(CLOSED, {'driver': driver, 'lap_number': lap_number}))
+            del self._written[key]
+
+        if aggregator.last_ids != self._last_ids:
+            self._last_ids = dict(aggregator.last_ids)
+            chunks.append(encode_record(META, {'last_ids': self._last_ids}))
+
+        if not chunks:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+
+        if os.path.getsize(self.path) > self.compact_bytes:
+            self.compact(aggregator)
+
+    def compact(self, aggregator):
+        """Rewrite the log as a single snapshot of the currently open laps"""
+        write_snapshot(self.path, aggregator.lap_data, aggregator.last_ids)
+        self._written = {
+            key: {field: len(lap.get(field, [])) for field in LAP_FIELDS}
+            for key, lap in aggregator.lap_data.items()
+        }
+        self._identity = {key: (lap['driver'], lap['lap_number']) for key, lap in aggregator.lap_data.items()}
+        self._last_ids = dict(aggregator.last_ids)
+
+
+def write_snapshot(path: str, laps: Dict[str, Dict], last_ids: Dict[str, int]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for lap in laps.values():
+            counts = {field: len(lap[field]) for field in LAP_FIELDS if lap.get(field)}
+            if counts:
+                f.write(encode_record(SAMPLES, {
+                    'driver': lap['driver'],
+                    'lap_number': lap['lap_number'],
+                    'counts': counts
+                }, [lap[field] for field in counts]))
+        f.write(encode_record(META, {'last_ids': last_ids}))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def reshard_checkpoints(directory: str, n_shards: int, shard_for: Callable[[str, int], int]) -> Dict[str, int]:
+    """
+    Redistribute the open laps of all checkpoint files in a directory across n_shards files,
+    so a restart with a different worker count still restores every lap exactly once.
+    Returns the merged last sample id per driver.
+    """
+    laps: Dict[str, Dict] = {}
+    last_ids: Dict[str, int] = {}
+    existing = glob.glob(os.path.join(directory, "laps-*.ckpt"))
+
+    for path in existing:
+        file_laps, file_ids, _ = load_checkpoint(path)
+        laps.update(file_laps)
+        for driver, last_id in file_ids.items():
+            last_ids[driver] = max(last_id, last_ids.get(driver, 0))
+
+    shards: List[Dict[str, Dict]] = [{} for _ in range(n_shards)]
+    for key, lap in laps.items():
+        shards[shard_for(str(lap['driver']), n_shards)][key] = lap
+
+    for shard, shard_laps in enumerate(shards):
+        shard_ids = {
+            driver: last_id for driver, last_id in last_ids.items()
+            if shard_for(driver, n_shards) == shard
+        }
+        write_snapshot(checkpoint_path(directory, shard), shard_laps, shard_ids)
+
+    keep = {checkpoint_path(directory, shard) for shard in range(n_shards)}
+    for path in existing:
+        if path not in keep:
+            os.remove(path)
+
+    return last_ids
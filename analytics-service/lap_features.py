@@ -0,0 +1,135 @@
+import math
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+# Mirrors LAP_AGG_FEATURES in mlaas-service/app.py, keyed by the training column names
+LAP_AGG_FEATURES = {
+    'Speed': ['mean', 'max', 'std', 'min', 'median'],
+    'Throttle': ['mean', 'max', 'std', 'min'],
+    'Brake': ['sum', 'mean', 'count'],
+    'nGear': ['mean', 'max', 'std', 'min'],
+    'RPM': ['mean', 'max', 'std', 'min', 'median'],
+    'DRS': ['sum', 'mean', 'count'],
+    'X': ['std', 'mean', 'max', 'min'],
+    'Y': ['std', 'mean', 'max', 'min']
+}
+
+# Training column -> TelemetryAggregator lap_data field
+LAP_FIELD_SOURCES = {
+    'Speed': 'speed',
+    'Throttle': 'throttle',
+    'Brake': 'brake',
+    'nGear': 'n_gear',
+    'RPM': 'rpm',
+    'DRS': 'drs',
+    'X': 'x',
+    'Y': 'y'
+}
+
+BASELINE_METRICS = {
+    'speed': 'Speed_mean',
+    'rpm': 'RPM_mean',
+    'throttle': 'Throttle_mean'
+}
+
+
+def _reduce(values: np.ndarray, agg: str) -> float:
+    if agg == 'count':
+        return float(values.size)
+    if values.size == 0:
+        return 0.0
+    if agg == 'std':
+        # pandas' std is the sample standard deviation
+        return float(values.std(ddof=1)) if values.size > 1 else 0.0
+    if agg == 'median':
+        return float(np.median(values))
+    return float(getattr(values, agg)())
+
+
+def compute_lap_features(lap_data: Dict) -> Dict[str, float]:
+    """Per-lap aggregates and derived features, as computed by compute_lap_features in MLaaS training"""
+    features: Dict[str, float] = {}
+
+    for column, aggs in LAP_AGG_FEATURES.items():
+        values = np.asarray(lap_data.get(LAP_FIELD_SOURCES[column], ()), dtype=np.float64)
+        for agg in aggs:
+            features[f"{column}_{agg}"] = _reduce(values, agg)
+
+    features['speed_range'] = features['Speed_max'] - features['Speed_min']
+    features['rpm_range'] = features['RPM_max'] - features['RPM_min']
+    features['throttle_range'] = features['Throttle_max'] - features['Throttle_min']
+    features['gear_range'] = features['nGear_max'] - features['nGear_min']
+
+    features['speed_efficiency'] = features['Speed_mean'] / (features['RPM_mean'] + 1)
+    features['throttle_efficiency'] = features['Speed_mean'] / (features['Throttle_mean'] + 0.1)
+
+    features['speed_consistency'] = 1 / (features['Speed_std'] + 1)
+    features['rpm_consistency'] = 1 / (features['RPM_std'] + 1)
+
+    return features
+
+
+class RunningStats:
+    """Welford's online mean and sample variance"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, std: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = std * std * (count - 1) if count > 1 else 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class DriverBaselines:
+    """
+    Running per-driver averages of lap means, the serving-time counterpart of
+    add_driver_features in MLaaS training, which computes them over all laps of a driver.
+    Seeded from the stats the current model was trained with, so a driver's first laps
+    after a restart are compared against the same baseline training used.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, RunningStats]] = {}
+
+    def seed(self, baselines: Dict[str, Dict[str, float]]):
+        """Start from MLaaS' per-driver training stats: {driver: {"laps", "speed_mean", "speed_std", ...}}"""
+        self.stats = {
+            driver: {
+                metric: RunningStats(int(stats['laps']), stats[f"{metric}_mean"], stats[f"{metric}_std"])
+                for metric in BASELINE_METRICS
+            }
+            for driver, stats in baselines.items()
+        }
+
+    def add_lap(self, driver: str, features: Dict[str, float]) -> Dict[str, float]:
+        """Fold a completed lap into its driver's baseline and return the baseline features for it"""
+        driver_stats = self.stats.setdefault(
+            driver, {metric: RunningStats() for metric in BASELINE_METRICS}
+        )
+
+        baseline = {}
+        for metric, column in BASELINE_METRICS.items():
+            stats = driver_stats[metric]
+            stats.add(features[column])
+            baseline[f"driver_{metric}_mean"] = stats.mean
+            baseline[f"driver_{metric}_std"] = stats.std
+            baseline[f"{metric}_vs_driver_avg"] = features[column] - stats.mean
+
+        return baseline
+
+
+def feature_vector(features: Dict[str, float], names: Sequence[str]) -> List[float]:
+    """Order features as requested by MLaaS; raises KeyError for features this service does not compute"""
+    return [features[name] for name in names]
@@ -0,0 +1,166 @@
+import os
+import json
+import zlib
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+import nats
+from nats.js.errors import APIError, NotFoundError
+
+
+NATS_PUBLISH_MODE = os.getenv('NATS_PUBLISH_MODE', 'core').lower()
+NATS_STREAM = os.getenv('NATS_STREAM', 'PREDICTIONS')
+NATS_STREAM_MAX_AGE = float(os.getenv('NATS_STREAM_MAX_AGE', str(7 * 24 * 3600)))
+NATS_STREAM_MAX_MSGS = int(os.getenv('NATS_STREAM_MAX_MSGS', '1000000'))
+NATS_MAX_INFLIGHT = int(os.getenv('NATS_MAX_INFLIGHT', '256'))
+NATS_ACK_TIMEOUT = float(os.getenv('NATS_ACK_TIMEOUT', '5'))
+NATS_PUBLISH_RETRIES = int(os.getenv('NATS_PUBLISH_RETRIES', '3'))
+NATS_ENCODING = os.getenv('NATS_ENCODING', 'json').lower()
+
+ENCODING_HEADER = 'Content-Encoding'
+
+logger = logging.getLogger(__name__)
+
+
+def encode_prediction(message: Dict, encoding: str = 'json') -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a prediction for NATS.
+    'json' is the original wire format; 'compact' is minified JSON deflated with zlib,
+    flagged with a Content-Encoding header so consumers can tell the two apart.
+    """
+    if encoding == 'compact':
+        data = json.dumps(message, separators=(',', ':')).encode()
+        return zlib.compress(data), {ENCODING_HEADER: 'deflate'}
+    return json.dumps(message).encode(), {}
+
+
+def decode_prediction(data: bytes, headers: Optional[Dict[str, str]] = None) -> Dict:
+    if headers and headers.get(ENCODING_HEADER) == 'deflate':
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+class PredictionPublisher:
+    """
+    Publishes predictions on NATS.
+    In 'core' mode messages are fire-and-forget as before. In 'jetstream' mode they are
+    stored in a stream: publishes are pipelined up to max_inflight unacknowledged messages,
+    retried on timeout and deduplicated by driver and lap through the Nats-Msg-Id header.
+    """
+
+    def __init__(self, nats_client, subject: str, mode: str = NATS_PUBLISH_MODE,
+                 stream: str = NATS_STREAM, encoding: str = NATS_ENCODING,
+                 max_inflight: int = NATS_MAX_INFLIGHT):
+        if mode not in ('core', 'jetstream'):
+            raise ValueError(f"Unknown NATS publish mode: {mode}")
+        if encoding not in ('json', 'compact'):
+            raise ValueError(f"Unknown NATS encoding: {encoding}")
+
+        self.nats_client = nats_client
+        self.subject = subject
+        self.mode = mode
+        self.stream = stream
+        self.encoding = encoding
+        self.js = None
+        self.inflight_slots = asyncio.Semaphore(max(1, max_inflight))
+        self.pending: Set[asyncio.Task] = set()
+        self.counters = defaultdict(int)
+        self.last_stream_seq = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self):
+        if self.mode == 'jetstream':
+            self.js = self.nats_client.jetstream()
+            await self.ensure_stream()
+
+    async def ensure_stream(self):
+        try:
+            await self.js.stream_info(self.stream)
+        except NotFoundError:
+            await self.js.add_stream(
+                name=self.stream,
+                subjects=[self.subject],
+                max_age=NATS_STREAM_MAX_AGE,
+                max_msgs=NATS_STREAM_MAX_MSGS
+            )
+
+    async def publish(self, message: Dict):
+        data, headers = encode_prediction(message, self.encoding)
+
+        if self.mode == 'core':
+            try:
+                await self.nats_client.publish(self.subject, data, headers=headers or None)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.counters['failed'] += 1
+                logger.error("Prediction publish failed: %s", self.last_error)
+                return
+            self.counters['published'] += 1
+            return
+
+        headers['Nats-Msg-Id'] = f"{message['driver']}:{message['lap_number']}"
+
+        # Blocks only once max_inflight publishes are still waiting for their ack
+        await self.inflight_slots.acquire()
+        task = asyncio.create_task(self._publish_acked(data, headers))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        self.counters['published'] += 1
+
+    async def _publish_acked(self, data: bytes, headers: Dict[str, str]):
+        try:
+            for attempt in range(NATS_PUBLISH_RETRIES + 1):
+                try:
+                    ack = await self.js.publish(
+                        self.subject, data,
+                        timeout=NATS_ACK_TIMEOUT,
+                        stream=self.stream,
+                        headers=headers
+                    )
+                except (nats.errors.TimeoutError, nats.errors.NoRespondersError, APIError) as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    if attempt < NATS_PUBLISH_RETRIES:
+                        self.counters['retries'] += 1
+                        await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+                    continue
+
+                self.counters['acked'] += 1
+                if ack.duplicate:
+                    self.counters['duplicates'] += 1
+                self.last_stream_seq = max(self.last_stream_seq, ack.seq)
+                return
+
+            self.counters['failed'] += 1
+            logger.error("Prediction not acknowledged by stream %s: %s", self.stream, self.last_error)
+        finally:
+            self.inflight_slots.release()
+
+    async def flush(self, timeout: Optional[float] = None):
+        """Wait until everything published so far is on the server (core) or acknowledged (jetstream)"""
+        if self.mode == 'core':
+            await self.nats_client.flush(timeout=timeout or 10)
+            return
+        if self.pending:
+            await asyncio.wait(set(self.pending), timeout=timeout)
+
+    async def close(self):
+        await self.flush(timeout=NATS_ACK_TIMEOUT * (NATS_PUBLISH_RETRIES + 1))
+        for task in self.pending:
+            task.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'encoding': self.encoding,
+            'stream': self.stream if self.mode == 'jetstream' else None,
+            'published': self.counters['published'],
+            'acked': self.counters['acked'],
+            'duplicates': self.counters['duplicates'],
+            'retries': self.counters['retries'],
+            'failed': self.counters['failed'],
+            'inflight': len(self.pending),
+            'last_stream_seq': self.last_stream_seq,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+
+class Subscription:
+    """Queue of new predictions for one streaming client, owned by the client's event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.loop = loop
+        self.max_pending = max_pending
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.overflowed = False
+
+    def deliver(self, message: Dict):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            # The client cannot keep up; end its stream so it resumes from its last sequence number
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(message)
+
+
+class PredictionStore:
+    """
+    Bounded store for published lap predictions.
+    Predictions live in a fixed-size ring buffer addressed by a monotonically increasing
+    sequence number, with per-driver and per-(driver, lap) indexes. Evicted predictions
+    can optionally be appended to a JSON lines spill file.
+    """
+
+    def __init__(self, capacity: int = 10000, spill_path: Optional[str] = None):
+        self.capacity = max(1, capacity)
+        self.spill_path = spill_path
+        self._slots: List[Optional[Dict]] = [None] * self.capacity
+        self._recorded_at: List[Optional[datetime]] = [None] * self.capacity
+        self._driver_seqs: Dict[str, Deque[int]] = {}
+        self._lap_index: Dict[tuple, int] = {}
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        return max(1, self._next_seq - self.capacity)
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    def add(self, message: Dict) -> Dict:
+        """Store a prediction, assigning it the next sequence number"""
+        with self._lock:
+            seq = self._next_seq
+            slot = seq % self.capacity
+
+            evicted = self._slots[slot]
+            if evicted is not None:
+                self._evict(evicted)
+
+            message = {**message, 'seq': seq}
+            self._slots[slot] = message
+            self._recorded_at[slot] = datetime.now()
+            self._driver_seqs.setdefault(message['driver'], deque()).append(seq)
+            self._lap_index[(message['driver'], message['lap_number'])] = seq
+            self._next_seq += 1
+
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+        return message
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, max_pending: int = 1000) -> Subscription:
+        """Register for predictions added from now on, delivered on the given event loop"""
+        subscription = Subscription(loop, max_pending)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _evict(self, message: Dict):
+        driver_seqs = self._driver_seqs.get(message['driver'])
+        if driver_seqs:
+            driver_seqs.popleft()
+            if not driver_seqs:
+                del self._driver_seqs[message['driver']]
+
+        key = (message['driver'], message['lap_number'])
+        if self._lap_index.get(key) == message['seq']:
+            del self._lap_index[key]
+
+        if self.spill_path:
+            try:
+                with open(self.spill_path, 'a') as f:
+                    f.write(json.dumps(message) + '\n')
+            except Exception as e:
+                pass
+
+    def _get(self, seq: int) -> Optional[Dict]:
+        if seq < self.first_seq or seq > self.last_seq:
+            return None
+        return self._slots[seq % self.capacity]
+
+    def get_lap(self, driver: str, lap_number: int) -> Optional[Dict]:
+        with self._lock:
+            seq = self._lap_index.get((driver, lap_number))
+            return self._get(seq) if seq is not None else None
+
+    def drivers(self) -> List[str]:
+        with self._lock:
+            return sorted(self._driver_seqs)
+
+    def query(self, driver: Optional[str] = None, lap_min: Optional[int] = None,
+              lap_max: Optional[int] = None, since: Optional[datetime] = None,
+              since_seq: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Return matching predictions in sequence order.
+        With since_seq, the first `limit` predictions after it are returned so clients can page forward;
+        otherwise the latest `limit` matches are returned.
+        """
+        if since is not None and since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+
+        with self._lock:
+            if driver is not None:
+                seqs = reversed(self._driver_seqs.get(driver, ()))
+            else:
+                seqs = range(self.last_seq, self.first_seq - 1, -1)
+
+            matches = []
+            for seq in seqs:
+                if since_seq is not None and seq <= since_seq:
+                    break
+                slot = seq % self.capacity
+                if since is not None and self._recorded_at[slot] < since:
+                    break
+
+                message = self._slots[slot]
+                if lap_min is not None and message['lap_number'] < lap_min:
+                    continue
+                if lap_max is not None and message['lap_number'] > lap_max:
+                    continue
+
+                matches.append(message)
+                if limit is not None and since_seq is None and len(matches) >= limit:
+                    break
+
+        matches.reverse()
+        if limit is not None:
+            matches = matches[:limit]
+        return matches
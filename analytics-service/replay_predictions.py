@@ -0,0 +1,83 @@
+"""
+Replay lap predictions from the JetStream stream written in NATS_PUBLISH_MODE=jetstream.
+Prints one JSON prediction per line, tagged with its stream sequence number,
+so consumers can catch up from the stream instead of polling /predictions.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+import nats
+from nats.js.api import ConsumerConfig, DeliverPolicy
+from nats.js.errors import NotFoundError
+
+from prediction_publisher import NATS_STREAM, decode_prediction
+
+
+async def replay(args) -> int:
+    nc = await nats.connect(args.nats_url)
+    try:
+        js = nc.jetstream()
+        try:
+            info = await js.stream_info(args.stream)
+        except NotFoundError:
+            print(f"Stream {args.stream} does not exist, is the analytics service running with NATS_PUBLISH_MODE=jetstream?", file=sys.stderr)
+            return 0
+        last_seq = info.state.last_seq
+        if last_seq == 0 and not args.follow:
+            return 0
+
+        if args.since_seq is not None:
+            config = ConsumerConfig(deliver_policy=DeliverPolicy.BY_START_SEQUENCE, opt_start_seq=args.since_seq + 1)
+        elif args.since_time is not None:
+            config = ConsumerConfig(deliver_policy=DeliverPolicy.BY_START_TIME, opt_start_time=args.since_time)
+        else:
+            config = ConsumerConfig(deliver_policy=DeliverPolicy.ALL)
+
+        subject = info.config.subjects[0] if info.config.subjects else None
+        subscription = await js.subscribe(subject, stream=args.stream, ordered_consumer=True, config=config)
+
+        printed = 0
+        while args.limit is None or printed < args.limit:
+            try:
+                msg = await subscription.next_msg(timeout=args.idle_timeout)
+            except nats.errors.TimeoutError:
+                if args.follow:
+                    continue
+                break
+
+            seq = msg.metadata.sequence.stream
+            prediction = decode_prediction(msg.data, msg.headers)
+            if args.driver is None or prediction.get('driver') in args.driver:
+                print(json.dumps({**prediction, 'stream_seq': seq}), flush=True)
+                printed += 1
+
+            if not args.follow and seq >= last_seq:
+                break
+
+        await subscription.unsubscribe()
+        return printed
+    finally:
+        await nc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay lap predictions from the NATS JetStream stream")
+    parser.add_argument("--nats-url", default="nats://localhost:4222", help="NATS server (default: nats://localhost:4222)")
+    parser.add_argument("--stream", default=NATS_STREAM, help=f"Stream name (default: {NATS_STREAM})")
+    parser.add_argument("--since-seq", type=int, help="Replay messages after this stream sequence")
+    parser.add_argument("--since-time", help="Replay messages stored at or after this RFC 3339 time")
+    parser.add_argument("--driver", action="append", help="Only print predictions for this driver (repeatable)")
+    parser.add_argument("--limit", type=int, help="Stop after printing this many predictions")
+    parser.add_argument("--follow", action="store_true", help="Keep waiting for new predictions")
+    parser.add_argument("--idle-timeout", type=float, default=2.0, help="Seconds to wait for the next message (default: 2)")
+    args = parser.parse_args()
+
+    asyncio.run(replay(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import queue
+import zlib
+import multiprocessing as mp
+from typing import Dict, List, Optional
+
+import instrumentation
+from aggregator import TelemetryAggregator, parse_telemetry_payload
+from lap_checkpoint import CHECKPOINT_INTERVAL, LapCheckpoint, checkpoint_path
+
+
+WORKER_QUEUE_BATCHES = int(os.getenv('WORKER_QUEUE_BATCHES', '1000'))
+WORKER_LAP_CHECK_INTERVAL = float(os.getenv('WORKER_LAP_CHECK_INTERVAL', '5'))
+
+DRIVER_PATTERN = re.compile(rb'"driver"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def shard_for(driver: str, n_shards: int) -> int:
+    # crc32 rather than hash() so routing is stable across processes and restarts
+    return zlib.crc32(driver.encode('utf-8')) % n_shards
+
+
+def extract_driver(payload: bytes) -> Optional[str]:
+    match = DRIVER_PATTERN.search(payload)
+    if match:
+        return match.group(1).decode('utf-8')
+    data = parse_telemetry_payload(payload)
+    return str(data['driver']) if data else None
+
+
+def run_worker(index: int, sample_queue: mp.Queue, result_queue: mp.Queue, checkpoint_dir: Optional[str] = None):
+    """Worker process: owns the TelemetryAggregator state of the drivers routed to it"""
+    aggregator = TelemetryAggregator()
+    processed = 0
+    invalid = 0
+    next_check = time.time() + WORKER_LAP_CHECK_INTERVAL
+
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = LapCheckpoint(checkpoint_path(checkpoint_dir, index))
+        checkpoint.restore(aggregator)
+    next_checkpoint = time.time() + CHECKPOINT_INTERVAL
+
+    while True:
+        try:
+            batch = sample_queue.get(timeout=1.0)
+        except queue.Empty:
+            batch = []
+
+        if batch is None:
+            break
+
+        for payload in batch:
+            data = parse_telemetry_payload(payload)
+            if data is None:
+                invalid += 1
+                continue
+            aggregator.add_telemetry(data)
+            processed += 1
+
+        if time.time() >= next_check:
+            for lap_summary in aggregator.check_completed_laps():
+                result_queue.put(('lap', index, lap_summary))
+            result_queue.put(('stats', index, {
+                'processed': processed,
+                'invalid': invalid,
+                'open_laps': len(aggregator.lap_data),
+                'add_telemetry': instrumentation.histogram('analytics_add_telemetry_seconds').snapshot()
+            }))
+            next_check = time.time() + WORKER_LAP_CHECK_INTERVAL
+
+        if checkpoint and time.time() >= next_checkpoint:
+            checkpoint.checkpoint(aggregator)
+            next_checkpoint = time.time() + CHECKPOINT_INTERVAL
+
+    if checkpoint:
+        checkpoint.checkpoint(aggregator)
+
+
+class ShardRouter:
+    """
+    Dispatcher side of the worker mode.
+    Raw MQTT payloads are routed by a hash of the driver to one of N worker processes,
+    sent in batches over per-worker queues; completed laps come back on a shared result queue.
+    """
+
+    def __init__(self, n_workers: int, checkpoint_dir: Optional[str] = None):
+        self.n_workers = n_workers
+        self.checkpoint_dir = checkpoint_dir
+        self.context = mp.get_context('spawn')
+        self.sample_queues = [self.context.Queue(maxsize=WORKER_QUEUE_BATCHES) for _ in range(n_workers)]
+        self.result_queue = self.context.Queue()
+        self.processes: List[mp.Process] = []
+        self.pending: List[List[bytes]] = [[] for _ in range(n_workers)]
+        self.worker_stats: Dict[int, Dict] = {}
+        self.routed = 0
+        self.dropped = 0
+
+    def start(self):
+        for index in range(self.n_workers):
+            process = self.context.Process(
+                target=run_worker,
+                args=(index, self.sample_queues[index], self.result_queue, self.checkpoint_dir),
+                name=f"analytics-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self):
+        for sample_queue in self.sample_queues:
+            try:
+                sample_queue.put_nowait(None)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def route(self, payload: bytes) -> bool:
+        driver = extract_driver(payload)
+        if driver is None:
+            return False
+        self.pending[shard_for(driver, self.n_workers)].append(payload)
+        self.routed += 1
+        return True
+
+    def flush(self):
+        for index, batch in enumerate(self.pending):
+            if not batch:
+                continue
+            try:
+                self.sample_queues[index].put_nowait(batch)
+            except queue.Full:
+                self.dropped += len(batch)
+            self.pending[index] = []
+
+    def drain_completed(self) -> List[Dict]:
+        completed = []
+        while True:
+            try:
+                kind, index, body = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'lap':
+                completed.append(body)
+            elif kind == 'stats':
+                self.worker_stats[index] = body
+        return completed
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.n_workers,
+            'alive': sum(1 for process in self.processes if process.is_alive()),
+            'routed': self.routed,
+            'dropped': self.dropped,
+            'per_worker': {index: self.worker_stats.get(index, {}) for index in range(self.n_workers)}
+        }
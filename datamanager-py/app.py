@@ -4,8 +4,9 @@ from concurrent import futures
 from datetime import datetime, timezone
 from typing import Optional, List
 
+import numpy as np
 import psycopg
-from psycopg.rows import dict_row
+from psycopg.rows import dict_row, tuple_row
 import grpc
 from google.protobuf.timestamp_pb2 import Timestamp
 from dotenv import load_dotenv
@@ -13,7 +14,13 @@ from dotenv import load_dotenv
 sys.path.insert(0, str(pathlib.Path(__file__).parent.joinpath("gen")))
 import telemetry_pb2, telemetry_pb2_grpc
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent.joinpath("shared")))
+import instrumentation
+from instrumentation import counter, span, timed
+
 from mqtt_client import MqttPublisher
+from downsample import lttb_indices
+from lap_compare import compare_laps
 
 logging.basicConfig(level=logging.CRITICAL)
 logger = logging.getLogger(__name__)
@@ -21,6 +28,24 @@ logger.setLevel(logging.CRITICAL)
 
 publisher = MqttPublisher()
 
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+CREATE_BATCH_MAX = int(os.getenv("CREATE_BATCH_MAX", "10000"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+DOWNSAMPLE_DEFAULT_POINTS = int(os.getenv("DOWNSAMPLE_DEFAULT_POINTS", "1000"))
+DOWNSAMPLE_MAX_POINTS = int(os.getenv("DOWNSAMPLE_MAX_POINTS", "10000"))
+COMPARE_DEFAULT_POINTS = int(os.getenv("COMPARE_DEFAULT_POINTS", "500"))
+COLUMNAR_MAX_PAGE_SIZE = int(os.getenv("COLUMNAR_MAX_PAGE_SIZE", "10000"))
+
+FIELD_COLUMNS = {
+    telemetry_pb2.SPEED: "speed",
+    telemetry_pb2.RPM: "rpm",
+    telemetry_pb2.THROTTLE: "throttle",
+    telemetry_pb2.X: "x",
+    telemetry_pb2.Y: "y",
+}
+
+CREATE_ERRORS = counter("datamanager_create_telemetry_errors_total", "CreateTelemetry and CreateTelemetryBatch calls that failed")
+
 def proto_to_dt(ts: Timestamp) -> datetime:
     return ts.ToDatetime().replace(tzinfo=timezone.utc)
 
@@ -47,6 +72,59 @@ def row_to_proto(row) -> telemetry_pb2.Telemetry:
     t.drs = bool(row["drs"])
     return t
 
+# One array per column over a page of rows, all in id order
+COLUMNS_SQL = """
+    SELECT array_agg(id ORDER BY id), array_agg(driver ORDER BY id),
+           array_agg((EXTRACT(EPOCH FROM timestamp) * 1000000)::int8 ORDER BY id),
+           array_agg(lap_number ORDER BY id), array_agg(x ORDER BY id), array_agg(y ORDER BY id),
+           array_agg(speed ORDER BY id), array_agg(throttle ORDER BY id), array_agg(brake ORDER BY id),
+           array_agg(n_gear ORDER BY id), array_agg(rpm ORDER BY id), array_agg(drs ORDER BY id)
+    FROM ({rows_sql}) AS page
+"""
+
+def fetch_columns(conn: psycopg.Connection, rows_sql: str, params: List) -> telemetry_pb2.TelemetryColumns:
+    """Rows of rows_sql packed into TelemetryColumns, straight from the database arrays"""
+    with conn.cursor(row_factory=tuple_row, binary=True) as cur:
+        cur.execute(COLUMNS_SQL.format(rows_sql=rows_sql), params)
+        ids, drivers, timestamp_us, lap_number, x, y, speed, throttle, brake, n_gear, rpm, drs = cur.fetchone()
+    if ids is None:
+        return telemetry_pb2.TelemetryColumns()
+    index = {}
+    driver_index = [index.setdefault(driver, len(index)) for driver in drivers]
+    return telemetry_pb2.TelemetryColumns(
+        id=ids, drivers=list(index), driver_index=driver_index, timestamp_us=timestamp_us,
+        lap_number=lap_number, x=x, y=y, speed=speed, throttle=throttle, brake=brake,
+        n_gear=n_gear, rpm=rpm, drs=drs
+    )
+
+def telemetry_payload(t: telemetry_pb2.Telemetry) -> dict:
+    return {
+        "id": t.id,
+        "driver": t.driver,
+        "timestampUtc": t.timestamp.ToDatetime().isoformat() + "Z",
+        "lapNumber": t.lap_number,
+        "x": t.x,
+        "y": t.y,
+        "speed": t.speed,
+        "throttle": t.throttle,
+        "brake": t.brake,
+        "nGear": t.n_gear,
+        "rpm": t.rpm,
+        "drs": t.drs
+    }
+
+def area_filters(request, where: List[str], params: List):
+    """Append the request's bbox/polygon conditions; both are served by the GiST index on point(x, y)"""
+    if request.HasField("bbox"):
+        b = request.bbox
+        where.append("point(x, y) <@ box(point(%s, %s), point(%s, %s))")
+        params.extend([b.min_x, b.min_y, b.max_x, b.max_y])
+    if request.polygon:
+        if len(request.polygon) < 3:
+            raise ValueError("Polygon needs at least 3 vertices")
+        where.append("point(x, y) <@ %s::polygon")
+        params.append("(" + ",".join(f"({p.x},{p.y})" for p in request.polygon) + ")")
+
 class DatabaseManager:
     def __init__(self):
         self.conn: Optional[psycopg.Connection] = None
@@ -95,6 +173,8 @@ class DatabaseManager:
         CREATE INDEX IF NOT EXISTS idx_telemetry_driver ON telemetry(driver);
         CREATE INDEX IF NOT EXISTS idx_telemetry_lap ON telemetry(lap_number);
         CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_telemetry_driver_id ON telemetry(driver, id);
+        CREATE INDEX IF NOT EXISTS idx_telemetry_position ON telemetry USING gist (point(x, y));
         """
         conn = self.get_connection()
         with conn.cursor() as cur:
@@ -104,6 +184,7 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
     def __init__(self, db: DatabaseManager):
         self.db = db
 
+    @timed("datamanager_create_telemetry_seconds", "CreateTelemetry handler time")
     def CreateTelemetry(self, request, context):
         t = request.telemetry
         sql = """
@@ -123,33 +204,73 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
             t.drs
         )
         try:
-            with self.db.get_connection().cursor() as cur:
-                cur.execute(sql, vals)
-                new_id = cur.fetchone()["id"]
-            
-            t_out = telemetry_pb2.Telemetry()
-            t_out.CopyFrom(t)
-            t_out.id = new_id
-            
-            publisher.publish({
-                "id": t_out.id,
-                "driver": t_out.driver,
-                "timestampUtc": t_out.timestamp.ToDatetime().isoformat() + "Z",
-                "lapNumber": t_out.lap_number,
-                "x": t_out.x,
-                "y": t_out.y,
-                "speed": t_out.speed,
-                "throttle": t_out.throttle,
-                "brake": t_out.brake,
-                "nGear": t_out.n_gear,
-                "rpm": t_out.rpm,
-                "drs": t_out.drs
-            })
+            # The span is current while publishing, so the MQTT payload carries its context
+            with span("CreateTelemetry", attributes={"telemetry.driver": t.driver}):
+                with self.db.get_connection().cursor() as cur:
+                    cur.execute(sql, vals)
+                    new_id = cur.fetchone()["id"]
+                
+                t_out = telemetry_pb2.Telemetry()
+                t_out.CopyFrom(t)
+                t_out.id = new_id
+                
+                publisher.publish(telemetry_payload(t_out))
             
             return telemetry_pb2.CreateTelemetryResponse(telemetry=t_out, success=True, message="Created")
         except Exception as e:
+            CREATE_ERRORS.inc()
             return telemetry_pb2.CreateTelemetryResponse(success=False, message=str(e))
 
+    @timed("datamanager_create_telemetry_batch_seconds", "CreateTelemetryBatch handler time")
+    def CreateTelemetryBatch(self, request, context):
+        batch = request.telemetries
+        if not batch:
+            return telemetry_pb2.CreateTelemetryBatchResponse(success=True, message="Created 0")
+        if len(batch) > CREATE_BATCH_MAX:
+            return telemetry_pb2.CreateTelemetryBatchResponse(
+                success=False, message=f"Batch too large: {len(batch)} > {CREATE_BATCH_MAX}"
+            )
+        # One statement per batch: the rows travel as column arrays and are unnested server-side
+        sql = """
+            INSERT INTO telemetry (driver, timestamp, lap_number, x, y, speed, throttle, brake, n_gear, rpm, drs)
+            SELECT driver, timestamp, lap_number, x, y, speed, throttle, brake, n_gear, rpm, drs
+            FROM unnest(
+                %s::text[], %s::timestamptz[], %s::int[], %s::float8[], %s::float8[], %s::float8[],
+                %s::float8[], %s::bool[], %s::int[], %s::float8[], %s::bool[]
+            ) WITH ORDINALITY AS b(driver, timestamp, lap_number, x, y, speed, throttle, brake, n_gear, rpm, drs, ord)
+            ORDER BY ord
+            RETURNING id
+        """
+        vals = (
+            [t.driver for t in batch],
+            [proto_to_dt(t.timestamp) for t in batch],
+            [t.lap_number for t in batch],
+            [t.x for t in batch],
+            [t.y for t in batch],
+            [t.speed for t in batch],
+            [t.throttle for t in batch],
+            [t.brake for t in batch],
+            [t.n_gear for t in batch],
+            [t.rpm for t in batch],
+            [t.drs for t in batch]
+        )
+        try:
+            with self.db.get_connection().cursor() as cur:
+                cur.execute(sql, vals)
+                # ids come from the sequence in insert order, which follows ord
+                ids = sorted(r["id"] for r in cur.fetchall())
+
+            t_out = telemetry_pb2.Telemetry()
+            for t, new_id in zip(batch, ids):
+                t_out.CopyFrom(t)
+                t_out.id = new_id
+                publisher.publish(telemetry_payload(t_out))
+
+            return telemetry_pb2.CreateTelemetryBatchResponse(ids=ids, success=True, message=f"Created {len(ids)}")
+        except Exception as e:
+            CREATE_ERRORS.inc()
+            return telemetry_pb2.CreateTelemetryBatchResponse(success=False, message=str(e))
+
     def GetTelemetry(self, request, context):
         sql = "SELECT * FROM telemetry WHERE id=%s"
         with self.db.get_connection().cursor() as cur:
@@ -195,7 +316,7 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
 
     def ListTelemetry(self, request, context):
         page = max(1, request.page or 1)
-        size = max(1, min(100, request.page_size or 10))
+        size = max(1, min(COLUMNAR_MAX_PAGE_SIZE if request.columnar else 100, request.page_size or 10))
         where = []
         params: List = []
         if request.driver_filter:
@@ -204,6 +325,10 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
         if request.lap_filter:
             where.append("lap_number = %s")
             params.append(request.lap_filter)
+        try:
+            area_filters(request, where, params)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
         where_sql = ("WHERE " + " AND ".join(where)) if where else ""
         count_sql = f"SELECT COUNT(*) AS c FROM telemetry {where_sql}"
         list_sql = f"""
@@ -212,15 +337,18 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
             ORDER BY id
             LIMIT %s OFFSET %s
         """
-        with self.db.get_connection().cursor() as cur:
+        conn = self.db.get_connection()
+        with conn.cursor() as cur:
             cur.execute(count_sql, params)
             total = cur.fetchone()["c"]
-            cur.execute(list_sql, params + [size, (page - 1) * size])
-            rows = cur.fetchall()
-        telemetries = [row_to_proto(r) for r in rows]
+            if request.columnar:
+                rows = {"columns": fetch_columns(conn, list_sql, params + [size, (page - 1) * size])}
+            else:
+                cur.execute(list_sql, params + [size, (page - 1) * size])
+                rows = {"telemetries": [row_to_proto(r) for r in cur.fetchall()]}
         total_pages = (total + size - 1) // size if total else 0
         return telemetry_pb2.ListTelemetryResponse(
-            telemetries=telemetries,
+            **rows,
             total_count=total,
             page=page,
             page_size=size,
@@ -228,20 +356,13 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
         )
 
     def Aggregate(self, request, context):
-        field_map = {
-            telemetry_pb2.SPEED: "speed",
-            telemetry_pb2.RPM: "rpm",
-            telemetry_pb2.THROTTLE: "throttle",
-            telemetry_pb2.X: "x",
-            telemetry_pb2.Y: "y",
-        }
         agg_map = {
             telemetry_pb2.MIN: "MIN",
             telemetry_pb2.MAX: "MAX",
             telemetry_pb2.AVG: "AVG",
             telemetry_pb2.SUM: "SUM",
         }
-        field = field_map.get(request.field)
+        field = FIELD_COLUMNS.get(request.field)
         func = agg_map.get(request.type)
         if not field or not func:
             return telemetry_pb2.AggregateResponse(success=False, message="Invalid field or type")
@@ -259,6 +380,10 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
         if request.end_time.seconds or request.end_time.nanos:
             where.append("timestamp <= %s")
             params.append(proto_to_dt(request.end_time))
+        try:
+            area_filters(request, where, params)
+        except ValueError as e:
+            return telemetry_pb2.AggregateResponse(success=False, message=str(e))
         where_sql = ("WHERE " + " AND ".join(where)) if where else ""
         sql = f"SELECT {func}({field}) AS value, COUNT(*) AS cnt FROM telemetry {where_sql}"
         with self.db.get_connection().cursor() as cur:
@@ -273,6 +398,151 @@ class TelemetryServiceImpl(telemetry_pb2_grpc.TelemetryServiceServicer):
             message="OK"
         )
 
+    @timed("datamanager_downsample_seconds", "DownsampleTelemetry handler time")
+    def DownsampleTelemetry(self, request, context):
+        if not request.driver_filter:
+            return telemetry_pb2.DownsampleTelemetryResponse(success=False, message="driver_filter required")
+        field = FIELD_COLUMNS.get(request.field)
+        if not field:
+            return telemetry_pb2.DownsampleTelemetryResponse(success=False, message="Invalid field")
+        points = max(2, min(DOWNSAMPLE_MAX_POINTS, request.points or DOWNSAMPLE_DEFAULT_POINTS))
+        where = ["driver = %s"]
+        params: List = [request.driver_filter]
+        if request.lap_filter:
+            where.append("lap_number = %s")
+            params.append(request.lap_filter)
+        if request.start_time.seconds or request.start_time.nanos:
+            where.append("timestamp >= %s")
+            params.append(proto_to_dt(request.start_time))
+        if request.end_time.seconds or request.end_time.nanos:
+            where.append("timestamp <= %s")
+            params.append(proto_to_dt(request.end_time))
+        where_sql = " AND ".join(where)
+
+        if request.method == telemetry_pb2.TIME_BUCKET:
+            rows, source_count = self._time_buckets(where_sql, params, points)
+        else:
+            rows, source_count = self._lttb(where_sql, params, field, points)
+
+        return telemetry_pb2.DownsampleTelemetryResponse(
+            telemetries=[row_to_proto(r) for r in rows],
+            source_count=source_count,
+            success=True,
+            message="OK"
+        )
+
+    def _lttb(self, where_sql: str, params: List, field: str, points: int):
+        # Only (id, time, value) travel for the whole series; full rows are fetched for the kept samples
+        series_sql = f"""
+            SELECT id, EXTRACT(EPOCH FROM timestamp)::float8, {field}::float8
+            FROM telemetry WHERE {where_sql}
+            ORDER BY timestamp, id
+        """
+        conn = self.db.get_connection()
+        with conn.cursor(row_factory=tuple_row) as cur:
+            cur.execute(series_sql, params)
+            series = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 3)
+        if not len(series):
+            return [], 0
+
+        keep = lttb_indices(series[:, 1], series[:, 2], points)
+        ids = series[keep, 0].astype(np.int64).tolist()
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM telemetry WHERE id = ANY(%s) ORDER BY timestamp, id", (ids,))
+            return cur.fetchall(), len(series)
+
+    def _time_buckets(self, where_sql: str, params: List, points: int):
+        # `points` equal-width buckets over the matching time range, each averaged into one row
+        sql = f"""
+            WITH s AS (SELECT * FROM telemetry WHERE {where_sql}),
+            r AS (SELECT MIN(timestamp) AS t0, EXTRACT(EPOCH FROM MAX(timestamp) - MIN(timestamp)) AS span FROM s)
+            SELECT 0 AS id, MIN(driver) AS driver, MIN(timestamp) AS timestamp, MIN(lap_number) AS lap_number,
+                   AVG(x) AS x, AVG(y) AS y, AVG(speed) AS speed, AVG(throttle) AS throttle,
+                   BOOL_OR(brake) AS brake, ROUND(AVG(n_gear))::int AS n_gear, AVG(rpm) AS rpm,
+                   BOOL_OR(drs) AS drs, COUNT(*) AS cnt
+            FROM s, r
+            GROUP BY LEAST(COALESCE(FLOOR(EXTRACT(EPOCH FROM s.timestamp - r.t0) / NULLIF(r.span, 0) * %s), 0), %s - 1)
+            ORDER BY 3
+        """
+        with self.db.get_connection().cursor() as cur:
+            cur.execute(sql, params + [points, points])
+            rows = cur.fetchall()
+        return rows, sum(r["cnt"] for r in rows)
+
+    @timed("datamanager_compare_laps_seconds", "CompareLaps handler time")
+    def CompareLaps(self, request, context):
+        points = max(2, min(DOWNSAMPLE_MAX_POINTS, request.points or COMPARE_DEFAULT_POINTS))
+        sql = """
+            SELECT EXTRACT(EPOCH FROM timestamp)::float8, x, y, speed, throttle, brake::int::float8
+            FROM telemetry WHERE driver = %s AND lap_number = %s
+            ORDER BY timestamp, id
+        """
+        laps = []
+        with self.db.get_connection().cursor(row_factory=tuple_row) as cur:
+            for lap in (request.reference, request.comparison):
+                cur.execute(sql, (lap.driver, lap.lap_number))
+                rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 6)
+                if len(rows) < 2:
+                    return telemetry_pb2.CompareLapsResponse(
+                        success=False, message=f"Not enough samples for {lap.driver} lap {lap.lap_number}"
+                    )
+                laps.append(rows)
+
+        aligned = compare_laps(laps[0], laps[1], points)
+        return telemetry_pb2.CompareLapsResponse(
+            **{name: np.asarray(values).tolist() for name, values in aligned.items()},
+            success=True,
+            message="OK"
+        )
+
+    def ListDrivers(self, request, context):
+        sql = "SELECT driver, COUNT(*) AS cnt, MAX(id) AS max_id FROM telemetry GROUP BY driver ORDER BY driver"
+        with self.db.get_connection().cursor() as cur:
+            cur.execute(sql)
+            rows = cur.fetchall()
+        return telemetry_pb2.ListDriversResponse(drivers=[
+            telemetry_pb2.DriverSummary(driver=r["driver"], count=r["cnt"], max_id=r["max_id"])
+            for r in rows
+        ])
+
+    def ExportTelemetry(self, request, context):
+        size = max(1, min(50000, request.batch_size or EXPORT_BATCH_SIZE))
+        where = ["id > %s"]
+        params: List = []
+        if request.driver_filter:
+            where.append("driver = %s")
+            params.append(request.driver_filter)
+        if request.start_time.seconds or request.start_time.nanos:
+            where.append("timestamp >= %s")
+            params.append(proto_to_dt(request.start_time))
+        if request.end_time.seconds or request.end_time.nanos:
+            where.append("timestamp <= %s")
+            params.append(proto_to_dt(request.end_time))
+        sql = f"""
+            SELECT * FROM telemetry
+            WHERE {" AND ".join(where)}
+            ORDER BY id
+            LIMIT %s
+        """
+        last_id = request.after_id
+        while context.is_active():
+            if request.columnar:
+                columns = fetch_columns(self.db.get_connection(), sql, [last_id] + params + [size])
+                ids = columns.id
+                batch = telemetry_pb2.ExportTelemetryBatch(columns=columns)
+            else:
+                with self.db.get_connection().cursor() as cur:
+                    cur.execute(sql, [last_id] + params + [size])
+                    rows = cur.fetchall()
+                ids = [r["id"] for r in rows]
+                batch = telemetry_pb2.ExportTelemetryBatch(telemetries=[row_to_proto(r) for r in rows])
+            if not ids:
+                break
+            last_id = ids[-1]
+            yield batch
+            if len(ids) < size:
+                break
+
 db_manager = DatabaseManager()
 
 def init_database() -> bool:
@@ -283,6 +553,8 @@ def init_database() -> bool:
 def serve():
     if not init_database():
         return
+    instrumentation.init_tracing("datamanager")
+    instrumentation.start_metrics_server(METRICS_PORT)
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     telemetry_pb2_grpc.add_TelemetryServiceServicer_to_server(
         TelemetryServiceImpl(db_manager), server
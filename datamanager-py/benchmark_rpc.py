@@ -0,0 +1,273 @@
+"""
+Micro-benchmarks for the datamanager RPC handlers.
+Tops the telemetry table up to --rows synthetic rows with COPY, then calls CreateTelemetry,
+ListTelemetry and Aggregate through gRPC at several concurrency levels, filter selectivities
+and page depths, and prints latency percentiles and throughput per scenario as JSON.
+Point POSTGRES_* at a scratch database; --reset truncates the telemetry table first.
+The in-process server does not publish to MQTT, and the rows written by the create scenarios
+are deleted afterwards; with --target they are still published by the running datamanager.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent import futures
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import grpc
+
+# app connects its MQTT publisher on import; never under the live datamanager's client id,
+# which would make the broker drop the live connection
+os.environ.setdefault("MQTT_CLIENT_ID", f"datamanager-bench-{os.getpid()}")
+import app
+from app import DatabaseManager, TelemetryServiceImpl, dt_to_proto, telemetry_pb2, telemetry_pb2_grpc
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SAMPLE_INTERVAL = timedelta(milliseconds=250)
+COPY_COLUMNS = "driver, timestamp, lap_number, x, y, speed, throttle, brake, n_gear, rpm, drs"
+CREATE_DRIVER = "BENCH"
+
+
+class NullPublisher:
+    """Stands in for app.publisher, so benchmark rows never reach telemetry/raw"""
+
+    def publish(self, payload: Dict[str, Any]):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def synthetic_row(i: int, drivers: int, samples_per_lap: int) -> tuple:
+    """Row i of the synthetic table: drivers interleaved as in live ingest, 4 Hz per driver"""
+    driver = i % drivers
+    sample = i // drivers
+    phase = (sample % samples_per_lap) / samples_per_lap * 2 * math.pi
+    wave = math.sin(3 * phase)
+    speed = 200 + 90 * wave
+    return (
+        f"D{driver:03d}",
+        BASE_TIME + sample * SAMPLE_INTERVAL,
+        sample // samples_per_lap + 1,
+        4000 * math.cos(phase) + driver,
+        2500 * math.sin(phase) - driver,
+        speed,
+        max(0.0, min(100.0, 50 + 50 * wave)),
+        wave < -0.7,
+        max(1, min(8, int(speed / 45))),
+        9000 + 2500 * wave,
+        wave > 0.9
+    )
+
+
+def seed_table(db: DatabaseManager, rows: int, drivers: int, samples_per_lap: int, reset: bool) -> Dict[str, Any]:
+    conn = db.get_connection()
+    if reset:
+        conn.execute("TRUNCATE telemetry RESTART IDENTITY")
+    existing = conn.execute("SELECT COUNT(*) AS c FROM telemetry").fetchone()["c"]
+
+    start = time.perf_counter()
+    added = max(0, rows - existing)
+    if added:
+        with conn.cursor() as cur:
+            with cur.copy(f"COPY telemetry ({COPY_COLUMNS}) FROM STDIN") as copy:
+                for i in range(existing, rows):
+                    copy.write_row(synthetic_row(i, drivers, samples_per_lap))
+        conn.execute("ANALYZE telemetry")
+    seconds = time.perf_counter() - start
+
+    return {
+        "rows": existing + added,
+        "added": added,
+        "seed_seconds": round(seconds, 2),
+        "seed_rows_per_s": int(added / seconds) if added and seconds > 0 else None
+    }
+
+
+def measure(call: Callable[[int], Any], calls: int, concurrency: int) -> Dict[str, Any]:
+    """Run call(0..calls-1) on `concurrency` threads; returns latency percentiles and throughput"""
+    latencies: List[float] = [0.0] * calls
+    failures = 0
+
+    def one(i: int) -> bool:
+        started = time.perf_counter()
+        ok = call(i)
+        latencies[i] = time.perf_counter() - started
+        return ok
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ok in pool.map(one, range(calls)):
+            failures += 0 if ok else 1
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "failures": failures,
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_per_s": round(calls / elapsed, 1) if elapsed > 0 else None
+    }
+
+
+def create_scenarios(stub, args) -> List[Dict[str, Any]]:
+    def telemetry(i: int) -> telemetry_pb2.Telemetry:
+        row = synthetic_row(i, 1, args.samples_per_lap)
+        t = telemetry_pb2.Telemetry(
+            driver=CREATE_DRIVER, lap_number=row[2], x=row[3], y=row[4], speed=row[5], throttle=row[6],
+            brake=row[7], n_gear=row[8], rpm=row[9], drs=row[10]
+        )
+        t.timestamp.CopyFrom(dt_to_proto(row[1]))
+        return t
+
+    def create(i: int) -> bool:
+        request = telemetry_pb2.CreateTelemetryRequest(telemetry=telemetry(i))
+        return stub.CreateTelemetry(request).success
+
+    def create_batch(i: int) -> bool:
+        batch = [telemetry(i * args.batch_size + j) for j in range(args.batch_size)]
+        return stub.CreateTelemetryBatch(telemetry_pb2.CreateTelemetryBatchRequest(telemetries=batch)).success
+
+    results = []
+    for concurrency in args.concurrency:
+        results.append({"rpc": "CreateTelemetry", **measure(create, args.calls, concurrency)})
+        result = measure(create_batch, max(1, args.calls // 10), concurrency)
+        result["rows_per_s"] = round(result["throughput_per_s"] * args.batch_size, 1) if result["throughput_per_s"] else None
+        results.append({"rpc": "CreateTelemetryBatch", "batch_size": args.batch_size, **result})
+    return results
+
+
+def filters(laps: int) -> Dict[str, Dict[str, Any]]:
+    """Filters from no selectivity down to a single lap of one driver"""
+    return {
+        "none": {},
+        "driver": {"driver_filter": "D000"},
+        "driver_lap": {"driver_filter": "D000", "lap_filter": max(1, laps // 2)},
+        # One corner of the synthetic track, every driver and lap
+        "area": {"bbox": telemetry_pb2.BoundingBox(min_x=3000, min_y=-500, max_x=4100, max_y=500)}
+    }
+
+
+def list_scenarios(stub, args, laps: int) -> List[Dict[str, Any]]:
+    results = []
+    for name, where in filters(laps).items():
+        for page in args.pages:
+            request = telemetry_pb2.ListTelemetryRequest(page=page, page_size=args.page_size, **where)
+            call = lambda i: stub.ListTelemetry(request).page == page
+            for concurrency in args.concurrency:
+                results.append({
+                    "rpc": "ListTelemetry", "filter": name, "page": page, "page_size": args.page_size,
+                    **measure(call, args.calls, concurrency)
+                })
+    return results
+
+
+def aggregate_scenarios(stub, args, laps: int, rows: int) -> List[Dict[str, Any]]:
+    window = telemetry_pb2.AggregateRequest(type=telemetry_pb2.AVG, field=telemetry_pb2.SPEED)
+    # The last minute of data across all drivers
+    last = BASE_TIME + (rows // args.drivers) * SAMPLE_INTERVAL
+    window.start_time.CopyFrom(dt_to_proto(last - timedelta(minutes=1)))
+    window.end_time.CopyFrom(dt_to_proto(last))
+
+    requests = {
+        name: telemetry_pb2.AggregateRequest(type=telemetry_pb2.AVG, field=telemetry_pb2.SPEED, **where)
+        for name, where in filters(laps).items()
+    }
+    requests["time_window"] = window
+
+    results = []
+    for name, request in requests.items():
+        call = lambda i, request=request: stub.Aggregate(request).success
+        for concurrency in args.concurrency:
+            results.append({"rpc": "Aggregate", "filter": name, **measure(call, args.calls, concurrency)})
+    return results
+
+
+def start_server(db: DatabaseManager, workers: int) -> tuple:
+    app.publisher.disconnect()
+    app.publisher = NullPublisher()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    telemetry_pb2_grpc.add_TelemetryServiceServicer_to_server(TelemetryServiceImpl(db), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark datamanager RPC handlers against a seeded table")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Seed the table up to this many rows (default: 1000000)")
+    parser.add_argument("--drivers", type=int, default=20, help="Synthetic drivers (default: 20)")
+    parser.add_argument("--samples-per-lap", type=int, default=360, help="Synthetic samples per lap (default: 360)")
+    parser.add_argument("--reset", action="store_true", help="Truncate the telemetry table before seeding")
+    parser.add_argument("--target", help="Benchmark a running datamanager instead of an in-process server")
+    parser.add_argument("--server-workers", type=int, default=10, help="Threads of the in-process server (default: 10)")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 8, 32], help="Comma-separated client concurrency levels (default: 1,8,32)")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per scenario (default: 200)")
+    parser.add_argument("--pages", type=int_list, default=[1, 100, 1000], help="Comma-separated ListTelemetry pages (default: 1,100,1000)")
+    parser.add_argument("--page-size", type=int, default=100, help="ListTelemetry page size (default: 100)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per CreateTelemetryBatch call (default: 500)")
+    parser.add_argument("--only", default="create,list,aggregate", help="Comma-separated RPC groups to run (default: all)")
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    if not db.connect():
+        print("Could not connect to PostgreSQL", file=sys.stderr)
+        return 1
+
+    seed = seed_table(db, args.rows, args.drivers, args.samples_per_lap, args.reset)
+    laps = seed["rows"] // args.drivers // args.samples_per_lap
+
+    server: Optional[grpc.Server] = None
+    target = args.target
+    if not target:
+        server, target = start_server(db, args.server_workers)
+
+    groups = set(args.only.split(","))
+    results: List[Dict[str, Any]] = []
+    try:
+        with grpc.insecure_channel(target) as channel:
+            stub = telemetry_pb2_grpc.TelemetryServiceStub(channel)
+            # Reads first, so the rows created by the write benchmark do not shift them
+            if "list" in groups:
+                results += list_scenarios(stub, args, laps)
+            if "aggregate" in groups:
+                results += aggregate_scenarios(stub, args, laps, seed["rows"])
+            if "create" in groups:
+                results += create_scenarios(stub, args)
+    finally:
+        if server is not None:
+            server.stop(0)
+        if "create" in groups:
+            # Keep seed_table's row count in step with synthetic_row for the next run
+            db.get_connection().execute("DELETE FROM telemetry WHERE driver = %s", (CREATE_DRIVER,))
+        db.disconnect()
+
+    report = {
+        "table": seed,
+        "drivers": args.drivers,
+        "laps_per_driver": laps,
+        "target": args.target or "in-process",
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def lttb_indices(t: np.ndarray, v: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `points` samples of the series (t, v), t ascending,
+    that keep its visual shape. The first and last samples are always kept; every bucket in
+    between contributes the sample forming the largest triangle with the previously kept
+    sample and the mean of the next bucket.
+    """
+    n = t.size
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1][:max(points, 0)], dtype=np.int64)
+
+    # Bucket edges over the interior samples 1..n-2
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Means of each bucket, for the "next bucket" vertex of the triangle
+    sums_t = np.add.reduceat(t[1:n - 1], edges[:-1] - 1)
+    sums_v = np.add.reduceat(v[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_t = np.append(sums_t / counts, t[-1])
+    mean_v = np.append(sums_v / counts, v[-1])
+
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        at, av = t[previous], v[previous]
+        ct, cv = mean_t[bucket + 1], mean_v[bucket + 1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((at - ct) * (v[start:end] - av) - (at - t[start:end]) * (cv - av))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+
+    return selected
@@ -0,0 +1,47 @@
+from typing import Dict
+
+import numpy as np
+
+
+def lap_progress(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Cumulative distance along the driven path, as a fraction of the lap (0 at the first sample, 1 at the last)"""
+    distance = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+    return distance / distance[-1] if distance[-1] > 0 else np.linspace(0.0, 1.0, x.size)
+
+
+def compare_laps(reference: np.ndarray, comparison: np.ndarray, points: int) -> Dict[str, np.ndarray]:
+    """
+    Resample two laps onto a common grid of `points` positions along the lap.
+    Each lap is an array of rows (epoch seconds, x, y, speed, throttle, brake) in time order.
+    Positions are taken as the share of each lap's own path length, so laps driven on slightly
+    different lines still line up; `distance` scales that share by the reference lap's length.
+    `time_delta` is the comparison's elapsed time minus the reference's at each position,
+    positive where the comparison lap is behind.
+    """
+    grid = np.linspace(0.0, 1.0, points)
+    aligned = {}
+    for name, lap in (("reference", reference), ("comparison", comparison)):
+        t, x, y, speed, throttle, brake = lap.T
+        progress = lap_progress(x, y)
+        aligned[name] = {
+            "elapsed": np.interp(grid, progress, t - t[0]),
+            "speed": np.interp(grid, progress, speed),
+            "throttle": np.interp(grid, progress, throttle),
+            "brake": np.interp(grid, progress, brake) >= 0.5,
+            "length": float(np.sum(np.hypot(np.diff(x), np.diff(y)))),
+            "lap_time": float(t[-1] - t[0])
+        }
+
+    ref, cmp = aligned["reference"], aligned["comparison"]
+    return {
+        "distance": grid * ref["length"],
+        "reference_speed": ref["speed"],
+        "comparison_speed": cmp["speed"],
+        "reference_throttle": ref["throttle"],
+        "comparison_throttle": cmp["throttle"],
+        "reference_brake": ref["brake"],
+        "comparison_brake": cmp["brake"],
+        "time_delta": cmp["elapsed"] - ref["elapsed"],
+        "reference_lap_time": ref["lap_time"],
+        "comparison_lap_time": cmp["lap_time"]
+    }
@@ -5,10 +5,16 @@ from typing import Any, Dict
 import paho.mqtt.client as mqtt
 import logging
 
+from instrumentation import counter, span, timed, with_trace_context
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.CRITICAL)
 
 
+PUBLISHED = counter("mqtt_published_total", "Messages handed to the MQTT client")
+PUBLISH_ERRORS = counter("mqtt_publish_errors_total", "Messages the MQTT client did not accept")
+
+
 class MqttPublisher:
     def __init__(self):
         self.host = os.getenv("MQTT_HOST", "mqtt")
@@ -40,21 +46,28 @@ class MqttPublisher:
     def _on_disconnect(self, client, userdata, rc):
         self._connected = False
 
+    @timed("mqtt_publish_seconds", "MqttPublisher.publish time, including reconnects")
     def publish(self, payload: Dict[str, Any]):
         try:
-            data = json.dumps(payload, default=str)
-            
-            with self._lock:
-                if not self._connected:
-                    try:
-                        self._client.reconnect()
-                    except Exception as e:
-                        pass
+            with span("mqtt.publish", attributes={"messaging.destination": self.topic}):
+                data = json.dumps(with_trace_context(payload), default=str)
                 
-                result = self._client.publish(self.topic, data, qos=self.qos, retain=False)
+                with self._lock:
+                    if not self._connected:
+                        try:
+                            self._client.reconnect()
+                        except Exception as e:
+                            pass
+                    
+                    result = self._client.publish(self.topic, data, qos=self.qos, retain=False)
+                
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                PUBLISHED.inc()
+            else:
+                PUBLISH_ERRORS.inc()
                     
         except Exception as e:
-            pass
+            PUBLISH_ERRORS.inc()
 
     def disconnect(self):
         if self._client:
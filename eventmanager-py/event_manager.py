@@ -1,11 +1,17 @@
 import os
+import sys
 import json
 import time
 import logging
+import pathlib
 from typing import Dict, Any, List
 import paho.mqtt.client as mqtt
 from dateutil import parser as dateparser
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent.joinpath("shared")))
+import instrumentation
+from instrumentation import counter, payload_context, span, timed, with_trace_context
+
 logging.basicConfig(level=logging.CRITICAL)
 logger = logging.getLogger('EventManager')
 logger.setLevel(logging.CRITICAL)
@@ -19,10 +25,14 @@ QOS = int(os.getenv("MQTT_QOS", "1"))
 SPEED_MAX = float(os.getenv("RULE_SPEED_MAX", "310"))
 RPM_MAX = float(os.getenv("RULE_RPM_MAX", "11500"))
 BRAKE_ALERT_SPEED = float(os.getenv("RULE_BRAKE_ALERT_SPEED", "280"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
 
 
-events_detected = 0
-messages_processed = 0
+events_detected = counter("eventmanager_events_detected_total", "Events raised by detect_events")
+messages_processed = counter("eventmanager_messages_processed_total", "Raw telemetry messages handled")
+invalid_messages = counter("eventmanager_invalid_messages_total", "Raw telemetry messages that were not valid JSON")
+publish_errors = counter("eventmanager_publish_errors_total", "Events that could not be published")
+handler_errors = counter("eventmanager_handler_errors_total", "Messages whose handling raised")
 
 client = mqtt.Client(
     client_id=os.getenv("MQTT_CLIENT_ID", "eventmanager-sub"), 
@@ -30,9 +40,8 @@ client = mqtt.Client(
 )
 
 
+@timed("eventmanager_detect_events_seconds", "detect_events time per message")
 def detect_events(msg: Dict[str, Any]) -> List[Dict[str, Any]]:
-    global events_detected
-    
     events = []
     
     try:
@@ -78,7 +87,7 @@ def detect_events(msg: Dict[str, Any]) -> List[Dict[str, Any]]:
                 "limit": BRAKE_ALERT_SPEED
             })
         
-        events_detected += len(events)
+        events_detected.inc(len(events))
         return events
         
     except Exception as e:
@@ -97,30 +106,35 @@ def on_disconnect(client, userdata, rc):
 
 
 def on_message(client, userdata, message):
-    global messages_processed
-    
     try:
 
         payload = json.loads(message.payload.decode("utf-8"))
-        messages_processed += 1
-        
-        detected_events = detect_events(payload)
+        messages_processed.inc()
         
-        for event in detected_events:
-            try:
-                event_json = json.dumps(event, default=str)
-                result = client.publish(TOPIC_OUT, event_json, qos=QOS, retain=False)
-                    
-            except Exception as e:
-                pass
+        # Continue the trace started by the datamanager, if the sample carries one
+        with span("detect_events", parent=payload_context(payload)):
+            detected_events = detect_events(payload)
+            
+            for event in detected_events:
+                try:
+                    event_json = json.dumps(with_trace_context(event), default=str)
+                    result = client.publish(TOPIC_OUT, event_json, qos=QOS, retain=False)
+                    if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                        publish_errors.inc()
+                        
+                except Exception as e:
+                    publish_errors.inc()
         
     except json.JSONDecodeError as e:
-        pass
+        invalid_messages.inc()
     except Exception as e:
-        pass
+        handler_errors.inc()
 
 
 def main():
+    instrumentation.init_tracing("eventmanager")
+    instrumentation.start_metrics_server(METRICS_PORT)
+    
     client.on_connect = on_connect
     client.on_disconnect = on_disconnect
     client.on_message = on_message
@@ -2,6 +2,7 @@ using Microsoft.AspNetCore.Mvc;
 using Telemetry;
 using Google.Protobuf.WellKnownTypes;
 using System.ComponentModel.DataAnnotations;
+using System.Globalization;
 
 namespace gateway_dotnet.Controllers;
 
@@ -139,6 +140,54 @@ public class TelemetryController : ControllerBase
         };
     }
 
+    private static string? ParseArea(double? minX, double? minY, double? maxX, double? maxY, string? polygon,
+        out BoundingBox? bbox, out List<Point2D>? vertices)
+    {
+        bbox = null;
+        vertices = null;
+
+        if (minX.HasValue || minY.HasValue || maxX.HasValue || maxY.HasValue)
+        {
+            if (!minX.HasValue || !minY.HasValue || !maxX.HasValue || !maxY.HasValue)
+            {
+                return "minX, minY, maxX and maxY must be given together.";
+            }
+            bbox = new BoundingBox { MinX = minX.Value, MinY = minY.Value, MaxX = maxX.Value, MaxY = maxY.Value };
+        }
+
+        if (!string.IsNullOrWhiteSpace(polygon))
+        {
+            vertices = new List<Point2D>();
+            foreach (var vertex in polygon.Split(';', StringSplitOptions.RemoveEmptyEntries | StringSplitOptions.TrimEntries))
+            {
+                var parts = vertex.Split(',');
+                if (parts.Length != 2
+                    || !double.TryParse(parts[0], NumberStyles.Float, CultureInfo.InvariantCulture, out var x)
+                    || !double.TryParse(parts[1], NumberStyles.Float, CultureInfo.InvariantCulture, out var y))
+                {
+                    return "Polygon must be a list of x,y vertices separated by ';'.";
+                }
+                vertices.Add(new Point2D { X = x, Y = y });
+            }
+            if (vertices.Count < 3)
+            {
+                return "Polygon needs at least 3 vertices.";
+            }
+        }
+
+        return null;
+    }
+
+    private static DownsampleMethod? ParseDownsampleMethod(string? method)
+    {
+        return method?.ToUpperInvariant() switch
+        {
+            "LTTB" => DownsampleMethod.Lttb,
+            "TIME_BUCKET" => DownsampleMethod.TimeBucket,
+            _ => null
+        };
+    }
+
     [HttpGet]
     [ProducesResponseType(typeof(object), StatusCodes.Status200OK)]
     [ProducesResponseType(StatusCodes.Status400BadRequest)]
@@ -146,8 +195,19 @@ public class TelemetryController : ControllerBase
         [FromQuery] string? driver = null,
         [FromQuery] int? lap = null,
         [FromQuery][Range(1, int.MaxValue)] int page = 1,
-        [FromQuery][Range(1, 100)] int pageSize = 50)
+        [FromQuery][Range(1, 100)] int pageSize = 50,
+        [FromQuery] double? minX = null,
+        [FromQuery] double? minY = null,
+        [FromQuery] double? maxX = null,
+        [FromQuery] double? maxY = null,
+        [FromQuery] string? polygon = null)
     {
+        var areaError = ParseArea(minX, minY, maxX, maxY, polygon, out var bbox, out var vertices);
+        if (areaError != null)
+        {
+            return BadRequest(areaError);
+        }
+
         var request = new ListTelemetryRequest
         {
             Page = page,
@@ -156,6 +216,16 @@ public class TelemetryController : ControllerBase
             LapFilter = lap ?? 0
         };
 
+        if (bbox != null)
+        {
+            request.Bbox = bbox;
+        }
+
+        if (vertices != null)
+        {
+            request.Polygon.AddRange(vertices);
+        }
+
         var response = await _client.ListTelemetryAsync(request);
         
         var telemetries = response.Telemetries.Select(ToDto).ToList();
@@ -170,6 +240,73 @@ public class TelemetryController : ControllerBase
         });
     }
 
+    [HttpGet("columns")]
+    [ProducesResponseType(typeof(object), StatusCodes.Status200OK)]
+    [ProducesResponseType(StatusCodes.Status400BadRequest)]
+    public async Task<ActionResult<object>> GetTelemetryColumns(
+        [FromQuery] string? driver = null,
+        [FromQuery] int? lap = null,
+        [FromQuery][Range(1, int.MaxValue)] int page = 1,
+        [FromQuery][Range(1, 10000)] int pageSize = 1000,
+        [FromQuery] double? minX = null,
+        [FromQuery] double? minY = null,
+        [FromQuery] double? maxX = null,
+        [FromQuery] double? maxY = null,
+        [FromQuery] string? polygon = null)
+    {
+        var areaError = ParseArea(minX, minY, maxX, maxY, polygon, out var bbox, out var vertices);
+        if (areaError != null)
+        {
+            return BadRequest(areaError);
+        }
+
+        var request = new ListTelemetryRequest
+        {
+            Page = page,
+            PageSize = pageSize,
+            DriverFilter = driver ?? "",
+            LapFilter = lap ?? 0,
+            Columnar = true
+        };
+
+        if (bbox != null)
+        {
+            request.Bbox = bbox;
+        }
+
+        if (vertices != null)
+        {
+            request.Polygon.AddRange(vertices);
+        }
+
+        var response = await _client.ListTelemetryAsync(request);
+        var columns = response.Columns ?? new TelemetryColumns();
+
+        return Ok(new
+        {
+            columns = new
+            {
+                id = columns.Id,
+                drivers = columns.Drivers,
+                driverIndex = columns.DriverIndex,
+                timestampUs = columns.TimestampUs,
+                lapNumber = columns.LapNumber,
+                x = columns.X,
+                y = columns.Y,
+                speed = columns.Speed,
+                throttle = columns.Throttle,
+                brake = columns.Brake,
+                nGear = columns.NGear,
+                rpm = columns.Rpm,
+                drs = columns.Drs
+            },
+            totalCount = response.TotalCount,
+            page = response.Page,
+            pageSize = response.PageSize,
+            totalPages = response.TotalPages
+        });
+    }
+
     [HttpGet("{id:long}")]
     [ProducesResponseType(typeof(TelemetryDto), StatusCodes.Status200OK)]
     [ProducesResponseType(StatusCodes.Status404NotFound)]
@@ -240,6 +377,100 @@ public class TelemetryController : ControllerBase
         return NoContent();
     }
 
+    [HttpGet("downsample")]
+    [ProducesResponseType(typeof(object), StatusCodes.Status200OK)]
+    [ProducesResponseType(StatusCodes.Status400BadRequest)]
+    public async Task<ActionResult<object>> Downsample(
+        [FromQuery][Required] string driver,
+        [FromQuery] int? lap = null,
+        [FromQuery] DateTime? from = null,
+        [FromQuery] DateTime? to = null,
+        [FromQuery][Range(2, 10000)] int points = 1000,
+        [FromQuery] string method = "LTTB",
+        [FromQuery] string field = "SPEED")
+    {
+        var downsampleMethod = ParseDownsampleMethod(method);
+        var downsampleField = ParseAggregateField(field);
+
+        if (!downsampleMethod.HasValue || !downsampleField.HasValue)
+        {
+            return BadRequest("Invalid method or field. Method must be one of: LTTB, TIME_BUCKET. Field must be one of: SPEED, RPM, THROTTLE, X, Y.");
+        }
+
+        var request = new DownsampleTelemetryRequest
+        {
+            DriverFilter = driver,
+            LapFilter = lap ?? 0,
+            Points = points,
+            Method = downsampleMethod.Value,
+            Field = downsampleField.Value
+        };
+
+        if (from.HasValue)
+        {
+            request.StartTime = DateTimeToTimestamp(from.Value);
+        }
+
+        if (to.HasValue)
+        {
+            request.EndTime = DateTimeToTimestamp(to.Value);
+        }
+
+        var response = await _client.DownsampleTelemetryAsync(request);
+
+        if (!response.Success)
+        {
+            return BadRequest(response.Message);
+        }
+
+        return Ok(new
+        {
+            telemetries = response.Telemetries.Select(ToDto).ToList(),
+            sourceCount = response.SourceCount,
+            method = method.ToUpperInvariant(),
+            field = field.ToUpperInvariant()
+        });
+    }
+
+    [HttpGet("compare")]
+    [ProducesResponseType(typeof(object), StatusCodes.Status200OK)]
+    [ProducesResponseType(StatusCodes.Status400BadRequest)]
+    public async Task<ActionResult<object>> CompareLaps(
+        [FromQuery][Required] string driver,
+        [FromQuery][Required] int lap,
+        [FromQuery][Required] string otherDriver,
+        [FromQuery][Required] int otherLap,
+        [FromQuery][Range(2, 10000)] int points = 500)
+    {
+        var request = new CompareLapsRequest
+        {
+            Reference = new LapRef { Driver = driver, LapNumber = lap },
+            Comparison = new LapRef { Driver = otherDriver, LapNumber = otherLap },
+            Points = points
+        };
+
+        var response = await _client.CompareLapsAsync(request);
+
+        if (!response.Success)
+        {
+            return BadRequest(response.Message);
+        }
+
+        return Ok(new
+        {
+            distance = response.Distance,
+            referenceSpeed = response.ReferenceSpeed,
+            comparisonSpeed = response.ComparisonSpeed,
+            referenceThrottle = response.ReferenceThrottle,
+            comparisonThrottle = response.ComparisonThrottle,
+            referenceBrake = response.ReferenceBrake,
+            comparisonBrake = response.ComparisonBrake,
+            timeDelta = response.TimeDelta,
+            referenceLapTime = response.ReferenceLapTime,
+            comparisonLapTime = response.ComparisonLapTime
+        });
+    }
+
     [HttpGet("aggregate")]
     [ProducesResponseType(typeof(object), StatusCodes.Status200OK)]
     [ProducesResponseType(StatusCodes.Status400BadRequest)]
@@ -249,7 +480,12 @@ public class TelemetryController : ControllerBase
         [FromQuery] string? driver = null,
         [FromQuery] int? lap = null,
         [FromQuery] DateTime? from = null,
-        [FromQuery] DateTime? to = null)
+        [FromQuery] DateTime? to = null,
+        [FromQuery] double? minX = null,
+        [FromQuery] double? minY = null,
+        [FromQuery] double? maxX = null,
+        [FromQuery] double? maxY = null,
+        [FromQuery] string? polygon = null)
     {
         var aggregateField = ParseAggregateField(field);
         var aggregateType = ParseAggregateType(type);
@@ -259,6 +495,12 @@ public class TelemetryController : ControllerBase
             return BadRequest("Invalid field or type. Field must be one of: SPEED, RPM, THROTTLE, X, Y. Type must be one of: MIN, MAX, AVG, SUM.");
         }
 
+        var areaError = ParseArea(minX, minY, maxX, maxY, polygon, out var bbox, out var vertices);
+        if (areaError != null)
+        {
+            return BadRequest(areaError);
+        }
+
         var request = new AggregateRequest
         {
             Field = aggregateField.Value,
@@ -277,6 +519,16 @@ public class TelemetryController : ControllerBase
             request.EndTime = DateTimeToTimestamp(to.Value);
         }
 
+        if (bbox != null)
+        {
+            request.Bbox = bbox;
+        }
+
+        if (vertices != null)
+        {
+            request.Polygon.AddRange(vertices);
+        }
+
         var response = await _client.AggregateAsync(request);
 
         if (!response.Success)
@@ -4,14 +4,24 @@ Uses FastAPI to provide REST endpoints for training and prediction
 """
 
 import os
+import io
+import json
+import sys
+import pathlib
+import csv
+import shutil
+import tempfile
+import hashlib
 import logging
+from functools import lru_cache
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 import joblib
 import pandas as pd
 import numpy as np
-from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
@@ -19,6 +29,14 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import warnings
 
+from telemetry_store import TelemetryStore, CsvStreamIngestor, RAW_COLUMNS, normalize_telemetry
+from datamanager_source import DatamanagerSource
+from compiled_model import CompiledForest, export_forest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent.joinpath("shared")))
+import instrumentation
+import profiling
+
 warnings.filterwarnings('ignore')
 
 logging.basicConfig(level=logging.CRITICAL)
@@ -35,6 +53,8 @@ app = FastAPI(
 
 model = None
 scaler = None
+compiled_model: Optional[CompiledForest] = None
+driver_baselines: Dict[str, Dict[str, float]] = {}
 model_info = {
     "status": "not_trained",
     "last_trained": None,
@@ -46,6 +66,17 @@ model_info = {
 DATA_PATH = os.getenv("DATA_PATH", "/data/f1_telemetry_wide.csv")
 MODEL_PATH = os.getenv("MODEL_PATH", "/app/models/lap_time_predictor.pkl")
 SCALER_PATH = os.getenv("SCALER_PATH", "/app/models/scaler.pkl")
+COMPILED_MODEL_PATH = os.getenv("COMPILED_MODEL_PATH", "/app/models/lap_time_predictor.npz")
+DRIVER_BASELINES_PATH = os.path.join(os.path.dirname(MODEL_PATH), "driver_baselines.json")
+STORE_PATH = os.getenv("STORE_PATH", "/app/store")
+DATAMANAGER_ADDR = os.getenv("DATAMANAGER_ADDR", "datamanager:50051")
+DATAMANAGER_EXPORT_WORKERS = int(os.getenv("DATAMANAGER_EXPORT_WORKERS", "2"))
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_SAMPLE_ROWS = int(os.getenv("UPLOAD_SAMPLE_ROWS", "100"))
+
+store = TelemetryStore(STORE_PATH)
+datamanager_store = TelemetryStore(os.path.join(STORE_PATH, "datamanager"))
 
 
 class PredictionRequest(BaseModel):
@@ -61,6 +92,13 @@ class PredictionRequest(BaseModel):
     y: float
 
 
+class FeaturePredictionRequest(BaseModel):
+    driver: str
+    lap_number: int
+    feature_schema: str
+    features: List[float]
+
+
 class PredictionResponse(BaseModel):
     predicted_lap_time: float
     confidence_interval: Dict[str, float]
@@ -83,90 +121,211 @@ class ModelInfoResponse(BaseModel):
     total_predictions: int
 
 
+LAP_AGG_FEATURES = {
+    'Speed': ['mean', 'max', 'std', 'min', 'median'],
+    'Throttle': ['mean', 'max', 'std', 'min'],
+    'Brake': ['sum', 'mean', 'count'],
+    'nGear': ['mean', 'max', 'std', 'min'],
+    'RPM': ['mean', 'max', 'std', 'min', 'median'],
+    'DRS': ['sum', 'mean', 'count'],
+    'X': ['std', 'mean', 'max', 'min'],
+    'Y': ['std', 'mean', 'max', 'min']
+}
+
+
+LAP_DERIVED_FEATURES = [
+    'speed_range', 'rpm_range', 'throttle_range', 'gear_range',
+    'speed_efficiency', 'throttle_efficiency',
+    'speed_consistency', 'rpm_consistency'
+]
+
+DRIVER_BASELINE_FEATURES = [
+    'driver_speed_mean', 'driver_speed_std',
+    'driver_rpm_mean', 'driver_rpm_std',
+    'driver_throttle_mean', 'driver_throttle_std',
+    'speed_vs_driver_avg', 'rpm_vs_driver_avg', 'throttle_vs_driver_avg'
+]
+
+# Every per-lap model input apart from the driver one-hot columns
+LAP_FEATURE_COLUMNS = [
+    f"{column}_{agg}" for column, aggs in LAP_AGG_FEATURES.items() for agg in aggs
+] + LAP_DERIVED_FEATURES + DRIVER_BASELINE_FEATURES
+
+
+def compute_lap_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate raw telemetry into per-lap features and lap times in a single groupby pass"""
+
+    lap_features = df.groupby(['driver', 'LapNumber']).agg(
+        {**LAP_AGG_FEATURES, 'timestamp': ['min', 'max']}
+    )
+    lap_features.columns = ['_'.join(col).strip() for col in lap_features.columns.values]
+    lap_features = lap_features.reset_index()
+
+    lap_features = lap_features.rename(columns={'LapNumber': 'lap_number'})
+
+    lap_time = (lap_features.pop('timestamp_max') - lap_features.pop('timestamp_min')).dt.total_seconds()
+
+    lap_features['speed_range'] = lap_features['Speed_max'] - lap_features['Speed_min']
+    lap_features['rpm_range'] = lap_features['RPM_max'] - lap_features['RPM_min']
+    lap_features['throttle_range'] = lap_features['Throttle_max'] - lap_features['Throttle_min']
+    lap_features['gear_range'] = lap_features['nGear_max'] - lap_features['nGear_min']
+
+    lap_features['speed_efficiency'] = lap_features['Speed_mean'] / (lap_features['RPM_mean'] + 1)
+    lap_features['throttle_efficiency'] = lap_features['Speed_mean'] / (lap_features['Throttle_mean'] + 0.1)
+
+    lap_features['speed_consistency'] = 1 / (lap_features['Speed_std'] + 1)
+    lap_features['rpm_consistency'] = 1 / (lap_features['RPM_std'] + 1)
+
+    lap_features['lap_time'] = lap_time
+
+    return lap_features
+
+
+def add_driver_features(lap_features: pd.DataFrame) -> pd.DataFrame:
+    """Add per-driver baseline features and keep only plausible lap times"""
+
+    driver_stats = lap_features.groupby('driver').agg({
+        'Speed_mean': ['mean', 'std'],
+        'RPM_mean': ['mean', 'std'],
+        'Throttle_mean': ['mean', 'std']
+    }).reset_index()
+    driver_stats.columns = ['driver', 'driver_speed_mean', 'driver_speed_std',
+                           'driver_rpm_mean', 'driver_rpm_std',
+                           'driver_throttle_mean', 'driver_throttle_std']
+
+    final_df = pd.merge(lap_features, driver_stats, on='driver')
+
+    final_df['speed_vs_driver_avg'] = final_df['Speed_mean'] - final_df['driver_speed_mean']
+    final_df['rpm_vs_driver_avg'] = final_df['RPM_mean'] - final_df['driver_rpm_mean']
+    final_df['throttle_vs_driver_avg'] = final_df['Throttle_mean'] - final_df['driver_throttle_mean']
+
+    # Laps the driver stats cover, before implausible lap times are dropped; not a model feature
+    final_df['driver_laps'] = final_df.groupby('driver')['driver'].transform('size')
+    final_df['lap_time'] = final_df.pop('lap_time')
+
+    final_df = final_df[(final_df['lap_time'] > 60) & (final_df['lap_time'] < 200)]
+
+    return final_df
+
+
+BASELINE_METRICS = ['speed', 'rpm', 'throttle']
+
+
+def summarize_driver_baselines(df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    The per-driver stats add_driver_features gave the training rows, so serving can start
+    each driver's running baseline from them instead of from zero
+    """
+    columns = [f"driver_{metric}_{stat}" for metric in BASELINE_METRICS for stat in ('mean', 'std')]
+    per_driver = df.groupby('driver')[['driver_laps'] + columns].first().fillna(0.0)
+
+    return {
+        str(driver): {
+            "laps": int(row['driver_laps']),
+            **{column[len("driver_"):]: float(row[column]) for column in columns}
+        }
+        for driver, row in per_driver.iterrows()
+    }
+
+
 def load_and_prepare_data(file_path: str) -> pd.DataFrame:
     """Load and prepare F1 telemetry data for training with advanced features"""
-    
-    try:
-        df = pd.read_csv(file_path)
-        
 
-        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce')
-        df = df.dropna(subset=['timestamp'])  
-        df = df.sort_values(['driver', 'LapNumber', 'timestamp'])
-        
-        lap_times = []
-        for driver in df['driver'].unique():
-            driver_data = df[df['driver'] == driver]
-            
-            for lap in driver_data['LapNumber'].unique():
-                lap_data = driver_data[driver_data['LapNumber'] == lap]
-                if len(lap_data) > 0:
-                    lap_time = (lap_data['timestamp'].max() - lap_data['timestamp'].min()).total_seconds()
-                    lap_times.append({
-                        'driver': driver,
-                        'lap_number': lap,
-                        'lap_time': lap_time
-                    })
-        
-        lap_times_df = pd.DataFrame(lap_times)
-        
-        agg_features = {
-            'Speed': ['mean', 'max', 'std', 'min', 'median'],
-            'Throttle': ['mean', 'max', 'std', 'min'],
-            'Brake': ['sum', 'mean', 'count'], 
-            'nGear': ['mean', 'max', 'std', 'min'],
-            'RPM': ['mean', 'max', 'std', 'min', 'median'],
-            'DRS': ['sum', 'mean', 'count'],  
-            'X': ['std', 'mean', 'max', 'min'],  
-            'Y': ['std', 'mean', 'max', 'min']  
-        }
-        
-        lap_features = df.groupby(['driver', 'LapNumber']).agg(agg_features)
-        lap_features.columns = ['_'.join(col).strip() for col in lap_features.columns.values]
-        lap_features = lap_features.reset_index()
-        
+    df = pd.read_csv(file_path)
 
-        lap_features = lap_features.rename(columns={'LapNumber': 'lap_number'})
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce')
+    df = df.dropna(subset=['timestamp'])
 
-        lap_features['speed_range'] = lap_features['Speed_max'] - lap_features['Speed_min']
-        lap_features['rpm_range'] = lap_features['RPM_max'] - lap_features['RPM_min']
-        lap_features['throttle_range'] = lap_features['Throttle_max'] - lap_features['Throttle_min']
-        lap_features['gear_range'] = lap_features['nGear_max'] - lap_features['nGear_min']
+    return add_driver_features(compute_lap_features(df))
 
-        lap_features['speed_efficiency'] = lap_features['Speed_mean'] / (lap_features['RPM_mean'] + 1)
-        lap_features['throttle_efficiency'] = lap_features['Speed_mean'] / (lap_features['Throttle_mean'] + 0.1)
-        
 
-        lap_features['speed_consistency'] = 1 / (lap_features['Speed_std'] + 1)
-        lap_features['rpm_consistency'] = 1 / (lap_features['RPM_std'] + 1)
-        
+def sync_datamanager() -> int:
+    """Pull telemetry added to the datamanager since the last sync into its own store"""
 
-        driver_stats = lap_features.groupby('driver').agg({
-            'Speed_mean': ['mean', 'std'],
-            'RPM_mean': ['mean', 'std'],
-            'Throttle_mean': ['mean', 'std']
-        }).reset_index()
-        driver_stats.columns = ['driver', 'driver_speed_mean', 'driver_speed_std', 
-                               'driver_rpm_mean', 'driver_rpm_std',
-                               'driver_throttle_mean', 'driver_throttle_std']
-        
+    source = DatamanagerSource(DATAMANAGER_ADDR, max_workers=DATAMANAGER_EXPORT_WORKERS)
+    frame, cursor = source.fetch(datamanager_store.get_cursor(DATAMANAGER_ADDR))
 
-        lap_features = pd.merge(lap_features, driver_stats, on='driver')
+    return datamanager_store.append_frame(frame, DATAMANAGER_ADDR, cursor=cursor)
 
-        lap_features['speed_vs_driver_avg'] = lap_features['Speed_mean'] - lap_features['driver_speed_mean']
-        lap_features['rpm_vs_driver_avg'] = lap_features['RPM_mean'] - lap_features['driver_rpm_mean']
-        lap_features['throttle_vs_driver_avg'] = lap_features['Throttle_mean'] - lap_features['driver_throttle_mean']
-        
 
-        final_df = pd.merge(lap_features, lap_times_df, on=['driver', 'lap_number'])
-        
+def load_training_data(source: str = "csv") -> pd.DataFrame:
+    """Sync the training source into its columnar store and build training data from the cached lap features"""
 
-        final_df = final_df[(final_df['lap_time'] > 60) & (final_df['lap_time'] < 200)]
-        
-        return final_df
-        
-    except Exception as e:
-        raise
+    if source == "datamanager":
+        sync_datamanager()
+        source_store = datamanager_store
+    else:
+        if os.path.exists(DATA_PATH):
+            store.ingest_csv(DATA_PATH)
+        source_store = store
+
+    if source_store.is_empty():
+        raise ValueError(f"No training data available from source '{source}'")
+
+    lap_features = source_store.update_lap_features(compute_lap_features)
+
+    return add_driver_features(lap_features)
+
+
+def export_compiled_model() -> CompiledForest:
+    """Export the trained forest and scaler to the flat-array format and load it for serving"""
+    global compiled_model
+
+    feature_names = joblib.load(os.path.join(os.path.dirname(MODEL_PATH), "feature_names.pkl"))
+    export_forest(model, scaler, feature_names, COMPILED_MODEL_PATH)
+    compiled_model = CompiledForest.load(COMPILED_MODEL_PATH)
+
+    return compiled_model
+
+
+class FeatureLayout:
+    """Positions of the dense lap features and of the driver one-hot columns in a compiled model's input"""
+
+    def __init__(self, feature_names: List[str]):
+        dense = set(LAP_FEATURE_COLUMNS)
+        positions = {name: index for index, name in enumerate(feature_names)}
+
+        self.n_features = len(feature_names)
+        self.dense_names = [name for name in feature_names if name in dense]
+        self.dense_index = np.array([positions[name] for name in self.dense_names], dtype=np.intp)
+        self.driver_index = {
+            name[len('driver_'):]: index for name, index in positions.items()
+            if name.startswith('driver_') and name not in dense
+        }
+        self.schema = hashlib.sha1("\n".join(self.dense_names).encode()).hexdigest()[:16]
+
+    def vector(self, driver: str, features: List[float]) -> np.ndarray:
+        x = np.zeros(self.n_features)
+        x[self.dense_index] = features
+        if driver in self.driver_index:
+            x[self.driver_index[driver]] = 1.0
+        return x
+
+
+@lru_cache(maxsize=4)
+def feature_layout(forest: CompiledForest) -> FeatureLayout:
+    return FeatureLayout(forest.feature_names)
+
+
+def prediction_response(tree_predictions: np.ndarray) -> PredictionResponse:
+    """Turn per-tree predictions into the lap time prediction with its confidence interval"""
+    prediction = tree_predictions.mean()
+    std_prediction = np.std(tree_predictions)
+    
+    prediction_variation = np.random.normal(0, std_prediction * 0.1)
+    final_prediction = prediction + prediction_variation
+
+    final_prediction = max(60, min(200, final_prediction))
+    
+    return PredictionResponse(
+        predicted_lap_time=float(final_prediction),
+        confidence_interval={
+            "lower": float(final_prediction - 1.5 * std_prediction),
+            "upper": float(final_prediction + 1.5 * std_prediction)
+        },
+        model_version="2.0.0",
+        timestamp=datetime.now().isoformat()
+    )
 
 
 def train_model(df: pd.DataFrame) -> Dict[str, Any]:
@@ -174,7 +333,9 @@ def train_model(df: pd.DataFrame) -> Dict[str, Any]:
     global model, scaler, model_info
     
 
-    feature_columns = [col for col in df.columns if col not in ['driver', 'lap_number', 'lap_time']]
+    global driver_baselines
+
+    feature_columns = [col for col in df.columns if col not in ['driver', 'lap_number', 'lap_time', 'driver_laps']]
     X = df[feature_columns]
     y = df['lap_time']
     
@@ -234,19 +395,37 @@ def train_model(df: pd.DataFrame) -> Dict[str, Any]:
     joblib.dump(model, MODEL_PATH)
     joblib.dump(scaler, SCALER_PATH)
     joblib.dump(X.columns.tolist(), os.path.join(os.path.dirname(MODEL_PATH), "feature_names.pkl"))
+    driver_baselines = summarize_driver_baselines(df)
+    with open(DRIVER_BASELINES_PATH, "w") as f:
+        json.dump(driver_baselines, f)
+    export_compiled_model()
     
     return model_info
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup if available"""
-    global model, scaler
+    """Load the compiled model on startup, exporting it from the pickled model if needed"""
+    global model, scaler, compiled_model, driver_baselines
+    instrumentation.init_tracing("mlaas")
     
+    if os.path.exists(DRIVER_BASELINES_PATH):
+        with open(DRIVER_BASELINES_PATH, "r") as f:
+            driver_baselines = json.load(f)
+
+    if os.path.exists(COMPILED_MODEL_PATH):
+        try:
+            compiled_model = CompiledForest.load(COMPILED_MODEL_PATH)
+            model_info["status"] = "loaded"
+            return
+        except Exception as e:
+            pass
+
     if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
         try:
             model = joblib.load(MODEL_PATH)
             scaler = joblib.load(SCALER_PATH)
+            export_compiled_model()
             model_info["status"] = "loaded"
         except Exception as e:
             pass
@@ -265,17 +444,33 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    return {"status": "healthy", "model_loaded": compiled_model is not None}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prediction latency histograms in the Prometheus text format"""
+    return instrumentation.render_prometheus()
+
+
+@app.get("/debug/profile/{kind}", response_class=PlainTextResponse, include_in_schema=False)
+def get_profile(kind: str, request: Request):
+    """Folded CPU or allocation profile of this process, when PROFILING_ENABLED=true; runs in the threadpool"""
+    status, body, headers = profiling.handle_request(f"{request.url.path}?{request.url.query}")
+    return PlainTextResponse(body, status_code=status, headers=headers)
 
 
 @app.post("/train", response_model=TrainingResponse)
-async def train_model_endpoint(background_tasks: BackgroundTasks):
-    """Train the lap time prediction model"""
+async def train_model_endpoint(
+    background_tasks: BackgroundTasks,
+    source: str = Query("csv", pattern="^(csv|datamanager)$")
+):
+    """Train the lap time prediction model from the CSV dataset or live datamanager telemetry"""
     try:
-        if not os.path.exists(DATA_PATH):
+        if source == "csv" and not os.path.exists(DATA_PATH) and store.is_empty():
             raise HTTPException(status_code=404, detail=f"Data file not found at {DATA_PATH}")
         
-        df = load_and_prepare_data(DATA_PATH)
+        df = load_training_data(source)
         
         metrics = train_model(df)
         
@@ -286,14 +481,17 @@ async def train_model_endpoint(background_tasks: BackgroundTasks):
             timestamp=datetime.now().isoformat()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_lap_time(request: PredictionRequest):
+@instrumentation.timed("mlaas_predict_seconds", "Duration of /predict requests")
+async def predict_lap_time(request: PredictionRequest, http_request: Request):
     """Predict lap time based on telemetry features"""
-    if model is None or scaler is None:
+    if compiled_model is None:
         raise HTTPException(
             status_code=503, 
             detail="Model not trained. Please train the model first using /train endpoint"
@@ -301,7 +499,7 @@ async def predict_lap_time(request: PredictionRequest):
     
     try:
 
-        feature_names = joblib.load(os.path.join(os.path.dirname(MODEL_PATH), "feature_names.pkl"))
+        feature_names = compiled_model.feature_names
         
         speed_max = request.speed * 1.15
         speed_min = request.speed * 0.85
@@ -380,28 +578,49 @@ async def predict_lap_time(request: PredictionRequest):
         
         features = features.reindex(columns=feature_names, fill_value=0)
         
-        features_scaled = scaler.transform(features)
-        
-        prediction = model.predict(features_scaled)[0]
+        with instrumentation.span("predict_lap_time", parent=instrumentation.header_context(http_request.headers)):
+            tree_predictions = compiled_model.predict_trees(features.to_numpy(dtype=np.float64))
         
-        tree_predictions = np.array([tree.predict(features_scaled) for tree in model.estimators_])
-        std_prediction = np.std(tree_predictions)
+        return prediction_response(tree_predictions)
         
-        prediction_variation = np.random.normal(0, std_prediction * 0.1)
-        final_prediction = prediction + prediction_variation
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        final_prediction = max(60, min(200, final_prediction))
-        
-        return PredictionResponse(
-            predicted_lap_time=float(final_prediction),
-            confidence_interval={
-                "lower": float(final_prediction - 1.5 * std_prediction),
-                "upper": float(final_prediction + 1.5 * std_prediction)
-            },
-            model_version="2.0.0",
-            timestamp=datetime.now().isoformat()
+
+@app.get("/model/features")
+async def get_model_features():
+    """Order of the dense feature vector accepted by /predict/features"""
+    if compiled_model is None:
+        raise HTTPException(status_code=503, detail="Model not trained")
+
+    layout = feature_layout(compiled_model)
+    return {
+        "feature_schema": layout.schema,
+        "features": layout.dense_names,
+        "drivers": sorted(layout.driver_index),
+        "driver_baselines": driver_baselines
+    }
+
+
+@app.post("/predict/features", response_model=PredictionResponse)
+@instrumentation.timed("mlaas_predict_features_seconds", "Duration of /predict/features requests")
+async def predict_from_features(request: FeaturePredictionRequest, http_request: Request):
+    """Predict lap time from the full per-lap feature vector, in the order given by /model/features"""
+    if compiled_model is None:
+        raise HTTPException(
+            status_code=503, 
+            detail="Model not trained. Please train the model first using /train endpoint"
         )
-        
+
+    layout = feature_layout(compiled_model)
+    if request.feature_schema != layout.schema or len(request.features) != len(layout.dense_names):
+        raise HTTPException(status_code=409, detail="Feature schema does not match the current model")
+
+    try:
+        with instrumentation.span("predict_from_features", parent=instrumentation.header_context(http_request.headers)):
+            tree_predictions = compiled_model.predict_trees(layout.vector(request.driver, request.features))
+        return prediction_response(tree_predictions)
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -418,26 +637,150 @@ async def get_model_info():
     )
 
 
+@app.post("/model/export")
+async def export_model():
+    """Re-export the trained model to the compiled flat-array format used for serving"""
+    global model, scaler
+
+    if model is None or scaler is None:
+        if not (os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)):
+            raise HTTPException(status_code=404, detail="No trained model to export")
+        model = joblib.load(MODEL_PATH)
+        scaler = joblib.load(SCALER_PATH)
+
+    try:
+        exported = export_compiled_model()
+
+        return {
+            "message": "Model exported successfully",
+            "path": COMPILED_MODEL_PATH,
+            "size_bytes": os.path.getsize(COMPILED_MODEL_PATH),
+            "trees": exported.n_trees,
+            "features": len(exported.feature_names)
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def validate_upload_head(head: bytes, complete: bool) -> List[str]:
+    """Validate the header and a sample of rows from the start of an upload, returns the header"""
+
+    lines = head.split(b"\n")
+    if not complete:
+        lines = lines[:-1]
+
+    header = next(csv.reader([lines[0].decode("utf-8-sig").strip()]), [])
+    missing = set(RAW_COLUMNS) - set(header)
+    if missing:
+        raise ValueError(f"Missing required columns: {sorted(missing)}")
+
+    sample_lines = [line for line in lines[1:UPLOAD_SAMPLE_ROWS + 1] if line.strip()]
+    if not sample_lines:
+        raise ValueError("No data rows found")
+
+    sample = pd.read_csv(io.BytesIO(b"\n".join(sample_lines)), header=None, names=header)
+    if normalize_telemetry(sample).empty:
+        raise ValueError("No valid telemetry rows in sample")
+
+    return header
+
+
+def read_csv_header(file_path: str) -> List[str]:
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        return next(csv.reader([f.readline().strip()]), [])
+
+
+def convert_upload(file: UploadFile, body: bytes, header: List[str], replace: bool) -> int:
+    """Stream the rest of an upload into the columnar store; blocking, run it off the event loop"""
+
+    ingestor = CsvStreamIngestor(store, header, source=f"upload:{file.filename}", replace=replace)
+    try:
+        ingestor.feed(body)
+        while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+            ingestor.feed(chunk)
+        return ingestor.close()
+    except BaseException:
+        ingestor.discard()
+        raise
+
+
+def append_to_dataset(upload_path: str):
+    """Append an uploaded CSV body to DATA_PATH; blocking, run it off the event loop"""
+
+    with open(DATA_PATH, "rb+") as dst, open(upload_path, "rb") as src:
+        if dst.seek(0, os.SEEK_END) > 0:
+            dst.seek(-1, os.SEEK_END)
+            if dst.read(1) != b"\n":
+                dst.write(b"\n")
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+
 @app.post("/upload-data")
-async def upload_training_data(file: UploadFile = File(...)):
-    """Upload new training data"""
+async def upload_training_data(
+    file: UploadFile = File(...),
+    mode: str = Query("replace", pattern="^(replace|append)$"),
+    convert: bool = False
+):
+    """
+    Upload new training data, streamed to disk in fixed-size chunks.
+    mode=append adds rows to the existing CSV instead of replacing it;
+    convert=true loads the rows into the columnar training store instead of DATA_PATH, where
+    mode=replace swaps out everything stored so far. Converted rows are published only once
+    the whole file has been read, so a failed upload can simply be retried.
+    """
     try:
-        file_path = f"/tmp/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
+        head = b""
+        complete = False
+        while head.count(b"\n") <= UPLOAD_SAMPLE_ROWS:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                complete = True
+                break
+            head += chunk
+
         try:
-            pd.read_csv(file_path, nrows=5)
-        except:
-            os.remove(file_path)
-            raise HTTPException(status_code=400, detail="Invalid CSV file")
-        
+            header = validate_upload_head(head, complete)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV file: {e}")
+
+        body_start = head.find(b"\n") + 1 if b"\n" in head else len(head)
+
+        if convert:
+            try:
+                rows = await run_in_threadpool(convert_upload, file, head[body_start:], header, mode == "replace")
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid CSV file: {e}")
+
+            return {"message": "Data uploaded and converted successfully", "path": STORE_PATH,
+                    "mode": mode, "rows": rows}
+
+        append = mode == "append" and os.path.exists(DATA_PATH)
+        if append and read_csv_header(DATA_PATH) != header:
+            raise HTTPException(status_code=400, detail="CSV header does not match the existing dataset")
+
         os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
-        os.rename(file_path, DATA_PATH)
-        
-        return {"message": "Data uploaded successfully", "path": DATA_PATH}
-        
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(DATA_PATH), suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(head[body_start:] if append else head)
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+            if append:
+                await run_in_threadpool(append_to_dataset, tmp_path)
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, DATA_PATH)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return {"message": "Data uploaded successfully", "path": DATA_PATH, "mode": "append" if append else "replace"}
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,107 @@
+"""
+Benchmark for MLaaS training data preparation.
+Generates a synthetic multi-season telemetry CSV and times load_and_prepare_data on it.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import load_and_prepare_data
+
+
+def generate_synthetic_csv(path: str, seasons: int, races: int, drivers: int,
+                           laps: int, samples_per_lap: int, seed: int = 42) -> int:
+    """Write a synthetic telemetry CSV in the same layout as f1_telemetry_wide.csv"""
+    rng = np.random.default_rng(seed)
+    rows_written = 0
+    header = True
+
+    for season in range(seasons):
+        for race in range(races):
+            race_start = pd.Timestamp(f"{2018 + season}-03-01", tz="UTC") + pd.Timedelta(days=14 * race)
+            n = drivers * laps * samples_per_lap
+
+            driver_idx = np.repeat(np.arange(drivers), laps * samples_per_lap)
+            lap_idx = np.tile(np.repeat(np.arange(1, laps + 1), samples_per_lap), drivers)
+            sample_idx = np.tile(np.arange(samples_per_lap), drivers * laps)
+
+            lap_seconds = rng.uniform(75, 110, size=drivers * laps).repeat(samples_per_lap)
+            offsets = (lap_idx - 1) * 120.0 + sample_idx / samples_per_lap * lap_seconds
+            timestamps = race_start + pd.to_timedelta(offsets, unit="s")
+
+            phase = sample_idx / samples_per_lap * 2 * np.pi
+            speed = 200 + 90 * np.sin(phase * 3) + rng.normal(0, 5, n)
+            df = pd.DataFrame({
+                "driver": np.char.add(f"S{season}R{race}D", driver_idx.astype(str)),
+                "timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                "LapNumber": lap_idx,
+                "X": 4000 * np.cos(phase) + rng.normal(0, 10, n),
+                "Y": 2500 * np.sin(phase) + rng.normal(0, 10, n),
+                "Speed": speed.clip(60, 340),
+                "Throttle": (50 + 50 * np.sin(phase * 3)).clip(0, 100),
+                "Brake": np.sin(phase * 3) < -0.7,
+                "nGear": np.clip((speed / 45).astype(int), 1, 8),
+                "RPM": (9000 + 2500 * np.sin(phase * 3) + rng.normal(0, 200, n)).clip(4000, 12500),
+                "DRS": np.where(np.sin(phase * 3) > 0.9, 12, 0),
+            })
+            df.to_csv(path, mode="w" if header else "a", header=header, index=False)
+            header = False
+            rows_written += n
+
+    return rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MLaaS training data preparation")
+    parser.add_argument("--seasons", type=int, default=3, help="Number of synthetic seasons (default: 3)")
+    parser.add_argument("--races", type=int, default=20, help="Races per season (default: 20)")
+    parser.add_argument("--drivers", type=int, default=20, help="Drivers per race (default: 20)")
+    parser.add_argument("--laps", type=int, default=10, help="Laps per driver (default: 10)")
+    parser.add_argument("--samples-per-lap", type=int, default=80, help="Samples per lap (default: 80)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs, best is reported (default: 3)")
+    parser.add_argument("--keep", help="Write the synthetic CSV to this path and keep it")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.keep:
+        csv_path = args.keep
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        csv_path = os.path.join(tmp_dir.name, "synthetic_telemetry.csv")
+
+    start = time.perf_counter()
+    rows = generate_synthetic_csv(csv_path, args.seasons, args.races, args.drivers,
+                                  args.laps, args.samples_per_lap)
+    generate_seconds = time.perf_counter() - start
+
+    timings = []
+    laps = 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        prepared = load_and_prepare_data(csv_path)
+        timings.append(time.perf_counter() - start)
+        laps = len(prepared)
+
+    best = min(timings)
+    print(json.dumps({
+        "rows": rows,
+        "laps": laps,
+        "generate_seconds": round(generate_seconds, 3),
+        "prepare_seconds_best": round(best, 3),
+        "prepare_seconds_all": [round(t, 3) for t in timings],
+        "rows_per_second": int(rows / best) if best > 0 else None
+    }, indent=2))
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
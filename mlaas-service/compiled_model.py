@@ -0,0 +1,92 @@
+"""
+Flat-array export of the trained RandomForestRegressor and StandardScaler.
+An exported model is a single .npz file that can be evaluated with NumPy alone,
+without scikit-learn, pandas or unpickling Python tree objects.
+"""
+
+from typing import List
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+
+def export_forest(model, scaler, feature_names: List[str], path: str):
+    """Flatten all trees of a fitted forest into shared node arrays and save them with the scaler"""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    node_counts = np.array([tree.node_count for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int32)
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    for root, tree in zip(roots, trees):
+        nodes = np.arange(tree.node_count, dtype=np.int32) + root
+        is_leaf = tree.children_left == -1
+
+        # Leaves point back to themselves, so evaluation can run a fixed number of steps
+        left.append(np.where(is_leaf, nodes, tree.children_left + root).astype(np.int32))
+        right.append(np.where(is_leaf, nodes, tree.children_right + root).astype(np.int32))
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        value.append(tree.value[:, 0, 0])
+
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            format_version=np.int32(FORMAT_VERSION),
+            feature_names=np.array(feature_names, dtype=str),
+            scaler_mean=np.asarray(scaler.mean_, dtype=np.float64),
+            scaler_scale=np.asarray(scaler.scale_, dtype=np.float64),
+            roots=roots,
+            max_depth=np.int32(max(tree.max_depth for tree in trees)),
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            value=np.concatenate(value)
+        )
+
+
+class CompiledForest:
+    """Pure-NumPy evaluator for forests written by export_forest"""
+
+    def __init__(self, arrays):
+        if int(arrays["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format {int(arrays['format_version'])}")
+
+        self.feature_names: List[str] = arrays["feature_names"].tolist()
+        self.scaler_mean = arrays["scaler_mean"]
+        self.scaler_scale = arrays["scaler_scale"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def predict_trees(self, X: np.ndarray) -> np.ndarray:
+        """Return per-tree predictions with shape (n_samples, n_trees) for unscaled features"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        # scikit-learn trees compare float32 inputs against float64 thresholds
+        X_scaled = ((X - self.scaler_mean) / self.scaler_scale).astype(np.float32)
+
+        rows = np.arange(X_scaled.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X_scaled.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = X_scaled[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_trees(X).mean(axis=1)
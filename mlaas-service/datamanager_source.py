@@ -0,0 +1,94 @@
+"""
+Training data source that pulls telemetry from the datamanager over gRPC.
+Each driver is exported on its own stream, starting after the last row id already synced.
+"""
+
+import sys
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+import grpc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.joinpath("gen")))
+import telemetry_pb2, telemetry_pb2_grpc
+
+from telemetry_store import RAW_COLUMNS
+
+
+GRPC_MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+# Every export stream holds one of the datamanager's 10 gRPC threads until it ends, and all of them
+# share its single database connection; keep most of the pool free for ingestion and analytics replay
+MAX_EXPORT_WORKERS = 4
+
+
+class DatamanagerSource:
+    """Bulk reader for TelemetryService.ExportTelemetry"""
+
+    def __init__(self, target: str, max_workers: int = 2, batch_size: int = 5000, timeout: float = 600.0):
+        self.target = target
+        self.max_workers = max(1, min(max_workers, MAX_EXPORT_WORKERS))
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def _channel(self) -> grpc.Channel:
+        return grpc.insecure_channel(self.target, options=[
+            ("grpc.max_receive_message_length", GRPC_MAX_MESSAGE_BYTES),
+        ])
+
+    def _export_driver(self, stub, driver: str, after_id: int) -> pd.DataFrame:
+        request = telemetry_pb2.ExportTelemetryRequest(
+            driver_filter=driver,
+            after_id=after_id,
+            batch_size=self.batch_size,
+            columnar=True
+        )
+        frames = []
+        for batch in stub.ExportTelemetry(request, timeout=self.timeout):
+            c = batch.columns
+            drivers = np.array(c.drivers, dtype=object)
+            frames.append(pd.DataFrame({
+                'id': np.array(c.id, dtype=np.int64),
+                'timestamp': pd.to_datetime(np.array(c.timestamp_us, dtype=np.int64), unit='us', utc=True),
+                'driver': drivers[np.array(c.driver_index, dtype=np.int64)],
+                'LapNumber': np.array(c.lap_number, dtype=np.int64),
+                'X': np.array(c.x, dtype=np.float64),
+                'Y': np.array(c.y, dtype=np.float64),
+                'Speed': np.array(c.speed, dtype=np.float64),
+                'Throttle': np.array(c.throttle, dtype=np.float64),
+                'Brake': np.array(c.brake, dtype=bool),
+                'nGear': np.array(c.n_gear, dtype=np.int64),
+                'RPM': np.array(c.rpm, dtype=np.float64),
+                'DRS': np.array(c.drs, dtype=bool)
+            }))
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def fetch(self, cursor: Dict[str, int]) -> Tuple[pd.DataFrame, Dict[str, int]]:
+        """
+        Export every row newer than the per-driver ids in cursor.
+        Returns the rows in store layout and the advanced cursor.
+        """
+        cursor = dict(cursor)
+
+        with self._channel() as channel:
+            stub = telemetry_pb2_grpc.TelemetryServiceStub(channel)
+            summaries = stub.ListDrivers(telemetry_pb2.ListDriversRequest(), timeout=self.timeout).drivers
+            pending = [s.driver for s in summaries if s.max_id > cursor.get(s.driver, 0)]
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                frames = list(pool.map(
+                    lambda driver: self._export_driver(stub, driver, cursor.get(driver, 0)),
+                    pending
+                ))
+
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=RAW_COLUMNS), cursor
+
+        for frame in frames:
+            cursor[frame['driver'].iat[0]] = int(frame['id'].max())
+
+        return pd.concat(frames, ignore_index=True)[RAW_COLUMNS], cursor
@@ -0,0 +1 @@
+"""Generated gRPC stubs for telemetry service"""
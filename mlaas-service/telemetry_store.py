@@ -0,0 +1,397 @@
+"""
+Columnar on-disk store for MLaaS training telemetry.
+Raw samples are kept as append-only Parquet parts, and per-lap features are cached
+in a Parquet table that is only recomputed for laps touched by newly ingested parts.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+RAW_COLUMNS = ['driver', 'timestamp', 'LapNumber', 'X', 'Y', 'Speed', 'Throttle', 'Brake', 'nGear', 'RPM', 'DRS']
+NUMERIC_COLUMNS = ['X', 'Y', 'Speed', 'Throttle', 'nGear', 'RPM']
+# Recorded telemetry has DRS status codes, where 10, 12 and 14 mean the flap is open (8 is only "eligible");
+# synthetic and datamanager data is already boolean. Both become 0/1, the encoding the analytics service serves with
+DRS_OPEN_CODE = 10
+DRS_TRUE_VALUES = ['true', 'yes', 'on']
+LAP_KEY = ['driver', 'LapNumber']
+
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_BATCH_BYTES = 64 * 1024 * 1024
+FINGERPRINT_BYTES = 64 * 1024
+# Bumped whenever normalize_telemetry changes what is stored; 2: DRS as 0/1 instead of raw status codes
+STORE_FORMAT = 2
+
+
+def drs_open(values: pd.Series) -> pd.Series:
+    """True where the DRS flap is open, for status codes as well as boolean columns"""
+    if values.dtype == bool:
+        return values
+    codes = pd.to_numeric(values, errors='coerce')
+    words = values.astype(str).str.strip().str.lower().isin(DRS_TRUE_VALUES)
+    return (codes >= DRS_OPEN_CODE) | words
+
+
+def normalize_telemetry(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce raw telemetry columns to the fixed types used by the store"""
+    missing = set(RAW_COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing required columns: {sorted(missing)}")
+
+    df = df[RAW_COLUMNS].copy()
+    df['driver'] = df['driver'].astype(str).str.strip()
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce', utc=True)
+    df['LapNumber'] = pd.to_numeric(df['LapNumber'], errors='coerce')
+    df = df.dropna(subset=['timestamp', 'LapNumber'])
+    df['LapNumber'] = df['LapNumber'].astype('int64')
+
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    if df['Brake'].dtype != bool:
+        df['Brake'] = df['Brake'].astype(str).str.strip().str.lower().isin(['true', '1', '1.0', 'yes'])
+    df['DRS'] = drs_open(df['DRS']).astype('float64')
+
+    return df.reset_index(drop=True)
+
+
+class TelemetryStore:
+    """Append-only Parquet parts for raw telemetry plus a cached per-lap feature table"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.raw_dir = self.root / "raw"
+        self.features_path = self.root / "lap_features.parquet"
+        self.manifest_path = self.root / "manifest.json"
+
+    def _load_manifest(self) -> Dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("format") == STORE_FORMAT:
+                return manifest
+            return self._reset(manifest)
+        return {"format": STORE_FORMAT, "next_part": 1, "parts": [], "sources": {}}
+
+    def _reset(self, manifest: Dict) -> Dict:
+        """
+        Drop a store written in an older format, so old and new rows are never mixed in one feature table.
+        Sources and cursors are cleared too: the CSV and the datamanager are re-ingested in full on the next
+        sync, while rows converted from uploads are gone and have to be uploaded again.
+        """
+        for part in manifest.get("parts", []):
+            (self.raw_dir / part["name"]).unlink(missing_ok=True)
+        self.features_path.unlink(missing_ok=True)
+
+        fresh = {"format": STORE_FORMAT, "next_part": manifest.get("next_part", 1), "parts": [], "sources": {}}
+        self._save_manifest(fresh)
+        return fresh
+
+    def _save_manifest(self, manifest: Dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_empty(self) -> bool:
+        return not self._load_manifest()["parts"]
+
+    def total_rows(self) -> int:
+        return sum(part["rows"] for part in self._load_manifest()["parts"])
+
+    def _write_part(self, manifest: Dict, df: pd.DataFrame, source: Optional[str]) -> int:
+        df = normalize_telemetry(df)
+        if df.empty:
+            return 0
+
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{manifest['next_part']:06d}.parquet"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), self.raw_dir / name)
+
+        manifest["next_part"] += 1
+        manifest["parts"].append({
+            "name": name,
+            "rows": len(df),
+            "source": source,
+            "featurized": False
+        })
+        return len(df)
+
+    def get_cursor(self, source: str) -> Dict:
+        """Return the sync position last recorded for an external source"""
+        return self._load_manifest().get("cursors", {}).get(source, {})
+
+    def append_frame(self, df: pd.DataFrame, source: Optional[str] = None,
+                     cursor: Optional[Dict] = None) -> int:
+        """
+        Append a frame of raw telemetry as a new part, returns the number of rows stored.
+        The optional cursor is saved for the source together with the part.
+        """
+        manifest = self._load_manifest()
+        rows = self._write_part(manifest, df, source)
+        if cursor is not None:
+            manifest.setdefault("cursors", {})[source] = cursor
+        if rows or cursor is not None:
+            self._save_manifest(manifest)
+        return rows
+
+    def stage_frame(self, df: pd.DataFrame) -> Optional[Dict]:
+        """Write a frame as a part outside the manifest, to be published or discarded later"""
+        df = normalize_telemetry(df)
+        if df.empty:
+            return None
+
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        name = f"staged-{uuid.uuid4().hex}.parquet"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), self.raw_dir / name)
+        return {"name": name, "rows": len(df)}
+
+    def publish_parts(self, staged: List[Dict], source: Optional[str] = None, replace: bool = False) -> int:
+        """
+        Add staged parts to the store in a single manifest update, returns the number of rows published.
+        With replace, every existing part is dropped first; source records are kept, so an unchanged
+        CSV is not ingested back next to the data that replaced it.
+        """
+        manifest = self._load_manifest()
+        if replace:
+            for part in manifest["parts"]:
+                (self.raw_dir / part["name"]).unlink(missing_ok=True)
+            manifest["parts"] = []
+            self.features_path.unlink(missing_ok=True)
+
+        for part in staged:
+            name = f"part-{manifest['next_part']:06d}.parquet"
+            os.replace(self.raw_dir / part["name"], self.raw_dir / name)
+            manifest["next_part"] += 1
+            manifest["parts"].append({
+                "name": name,
+                "rows": part["rows"],
+                "source": source,
+                "featurized": False
+            })
+
+        if staged or replace:
+            self._save_manifest(manifest)
+        return sum(part["rows"] for part in staged)
+
+    def discard_parts(self, staged: List[Dict]):
+        for part in staged:
+            (self.raw_dir / part["name"]).unlink(missing_ok=True)
+
+    def _drop_source(self, manifest: Dict, source: str):
+        kept = []
+        for part in manifest["parts"]:
+            if part["source"] == source:
+                (self.raw_dir / part["name"]).unlink(missing_ok=True)
+            else:
+                kept.append(part)
+        manifest["parts"] = kept
+        manifest["sources"].pop(source, None)
+
+        self.features_path.unlink(missing_ok=True)
+        for part in manifest["parts"]:
+            part["featurized"] = False
+
+    @staticmethod
+    def _prefix_fingerprint(f, offset: int) -> str:
+        """Hash of the first and last FINGERPRINT_BYTES of the file's first `offset` bytes"""
+        digest = hashlib.sha256(str(offset).encode())
+        f.seek(0)
+        digest.update(f.read(min(offset, FINGERPRINT_BYTES)))
+        if offset > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, offset - FINGERPRINT_BYTES))
+            digest.update(f.read(offset - f.tell()))
+        return digest.hexdigest()
+
+    def ingest_csv(self, csv_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+        """
+        Ingest a telemetry CSV into the store.
+        A file that is the same file (inode) and still starts with the bytes already ingested
+        is read from the previous byte offset; any other change re-ingests it from scratch.
+        """
+        source = os.path.abspath(csv_path)
+        stat = os.stat(source)
+        manifest = self._load_manifest()
+        info = manifest["sources"].get(source)
+
+        with open(source, "rb") as f:
+            header_line = f.readline()
+            header = next(csv.reader([header_line.decode("utf-8")]))
+
+            if (info and info["size"] == stat.st_size and info["mtime"] == stat.st_mtime
+                    and info.get("inode") == stat.st_ino):
+                return 0
+
+            # Appending is only safe when the ingested prefix is byte-for-byte what we read before
+            if info and (
+                stat.st_size < info["offset"]
+                or info["header"] != header
+                or info.get("inode") != stat.st_ino
+                or info.get("fingerprint") != self._prefix_fingerprint(f, info["offset"])
+            ):
+                self._drop_source(manifest, source)
+                info = None
+
+            offset = info["offset"] if info else len(header_line)
+            f.seek(offset)
+
+            rows = 0
+            reader = pd.read_csv(
+                f,
+                header=None,
+                names=header,
+                usecols=lambda col: col in RAW_COLUMNS,
+                chunksize=chunk_rows
+            )
+            for chunk in reader:
+                rows += self._write_part(manifest, chunk, source)
+
+            end_offset = f.seek(0, os.SEEK_END)
+            fingerprint = self._prefix_fingerprint(f, end_offset)
+
+        manifest["sources"][source] = {
+            "offset": end_offset,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "inode": stat.st_ino,
+            "fingerprint": fingerprint,
+            "header": header
+        }
+        self._save_manifest(manifest)
+        return rows
+
+    def read_columns(self, columns: List[str], filter: Optional[ds.Expression] = None,
+                     part_names: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read only the requested raw columns, optionally restricted to some parts and a row filter"""
+        if part_names is None:
+            part_names = [part["name"] for part in self._load_manifest()["parts"]]
+        if not part_names:
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset([str(self.raw_dir / name) for name in part_names], format="parquet")
+        return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+    def read_lap_features(self) -> Optional[pd.DataFrame]:
+        if not self.features_path.exists():
+            return None
+        return pq.read_table(self.features_path).to_pandas()
+
+    def _write_lap_features(self, features: pd.DataFrame):
+        tmp_path = self.features_path.with_suffix(".tmp")
+        pq.write_table(pa.Table.from_pandas(features, preserve_index=False), tmp_path)
+        os.replace(tmp_path, self.features_path)
+
+    def update_lap_features(self, featurize: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Bring the cached per-lap feature table up to date and return it.
+        Only laps that appear in parts ingested since the last update are recomputed.
+        """
+        manifest = self._load_manifest()
+        pending = [part["name"] for part in manifest["parts"] if not part["featurized"]]
+        features = self.read_lap_features()
+
+        if features is not None and not pending:
+            return features
+
+        if features is None:
+            features = featurize(self.read_columns(RAW_COLUMNS))
+        else:
+            touched = self.read_columns(LAP_KEY, part_names=pending).drop_duplicates()
+            row_filter = (
+                ds.field('driver').isin(touched['driver'].unique().tolist())
+                & ds.field('LapNumber').isin(touched['LapNumber'].unique().tolist())
+            )
+            raw = self.read_columns(RAW_COLUMNS, filter=row_filter).merge(touched, on=LAP_KEY)
+            refreshed = featurize(raw)
+
+            touched = touched.rename(columns={'LapNumber': 'lap_number'})
+            unchanged = features.merge(touched, on=['driver', 'lap_number'], how='left', indicator=True)
+            unchanged = unchanged[unchanged['_merge'] == 'left_only'].drop(columns='_merge')
+
+            features = pd.concat([unchanged, refreshed], ignore_index=True)
+            features = features.sort_values(['driver', 'lap_number']).reset_index(drop=True)
+
+        self._write_lap_features(features)
+
+        for part in manifest["parts"]:
+            part["featurized"] = True
+        self._save_manifest(manifest)
+
+        return features
+
+
+class CsvStreamIngestor:
+    """
+    Converts a CSV byte stream into store parts without holding the whole stream in memory.
+    Parts are staged as the stream is read and only become visible in the store on close(),
+    so a stream that fails halfway leaves nothing behind once discard() is called.
+    """
+
+    def __init__(self, store: TelemetryStore, header: List[str], source: Optional[str] = None,
+                 replace: bool = False, batch_bytes: int = DEFAULT_BATCH_BYTES):
+        self.store = store
+        self.header = header
+        self.source = source
+        self.replace = replace
+        self.batch_bytes = batch_bytes
+        self.rows = 0
+        self.staged: List[Dict] = []
+        self._partial = b""
+        self._batch: List[bytes] = []
+        self._batch_size = 0
+
+    def feed(self, data: bytes):
+        """Feed CSV body bytes (without the header line), split at arbitrary positions"""
+        data = self._partial + data
+        cut = data.rfind(b"\n") + 1
+        self._partial = data[cut:]
+
+        if cut:
+            self._batch.append(data[:cut])
+            self._batch_size += cut
+            if self._batch_size >= self.batch_bytes:
+                self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+
+        frame = pd.read_csv(
+            io.BytesIO(b"".join(self._batch)),
+            header=None,
+            names=self.header,
+            usecols=lambda col: col in RAW_COLUMNS
+        )
+        self._batch = []
+        self._batch_size = 0
+        part = self.store.stage_frame(frame)
+        if part is not None:
+            self.staged.append(part)
+            self.rows += part["rows"]
+
+    def close(self) -> int:
+        """Flush the remaining buffered rows and publish every staged part, returns the total number of rows stored"""
+        if self._partial.strip():
+            self._batch.append(self._partial)
+        self._partial = b""
+        self._flush()
+        rows = self.store.publish_parts(self.staged, self.source, replace=self.replace)
+        self.staged = []
+        return rows
+
+    def discard(self):
+        """Delete the parts staged so far, for a stream that could not be read to the end"""
+        self.store.discard_parts(self.staged)
+        self.staged = []
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Set, Tuple
+
+import aiohttp
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncTelemetryStreamer:
+    """
+    asyncio counterpart of TelemetryStreamer's sending side.
+    Rows are posted with up to `concurrency` requests in flight over a pool of
+    keep-alive connections, paced by a token bucket instead of sleeping per burst.
+    """
+
+    def __init__(self, base_url: str, rate: int = 50, burst: int = 1,
+                 concurrency: int = 64, connections: int = 32, max_retries: int = 3):
+        self.base_url = base_url.rstrip('/')
+        self.api_endpoint = f"{self.base_url}/api/telemetry"
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = max(1, concurrency)
+        self.connections = max(1, connections)
+        self.max_retries = max_retries
+
+        self.total_sent = 0
+        self.total_errors = 0
+        self.start_time = None
+        self.elapsed = 0.0
+
+    async def send_single_telemetry(self, session: aiohttp.ClientSession, telemetry: Dict[str, Any]) -> bool:
+        for attempt in range(self.max_retries):
+            try:
+                async with session.post(self.api_endpoint, json=telemetry) as response:
+                    await response.read()
+
+                    if response.status == 201:
+                        self.total_sent += 1
+                        return True
+                    elif response.status >= 500:
+                        await asyncio.sleep(2 ** attempt)
+                        continue
+                    else:
+                        self.total_errors += 1
+                        return False
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                await asyncio.sleep(2 ** attempt)
+
+        self.total_errors += 1
+        return False
+
+    async def stream(self, telemetry_rows: Iterable[Dict[str, Any]]):
+        """Send rows as fast as the token bucket allows"""
+        bucket = TokenBucket(self.rate, self.burst)
+
+        async def paced():
+            for telemetry in telemetry_rows:
+                await bucket.acquire()
+                yield telemetry
+
+        await self._send_all(paced())
+
+    async def replay(self, timed_rows: Iterable[Tuple[float, Dict[str, Any]]], pacer):
+        """Send (epoch, row) pairs when the pacer releases them"""
+
+        async def paced():
+            for epoch, telemetry in timed_rows:
+                await pacer.wait(epoch)
+                yield telemetry
+
+        await self._send_all(paced())
+
+    async def _send_all(self, paced_rows: AsyncIterator[Dict[str, Any]]):
+        in_flight = asyncio.Semaphore(self.concurrency)
+        pending: Set[asyncio.Task] = set()
+
+        connector = aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=30)
+        headers = {'User-Agent': 'TelemetryStreamer/1.0'}
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        self.start_time = time.time()
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+
+            async def send(telemetry):
+                try:
+                    await self.send_single_telemetry(session, telemetry)
+                finally:
+                    in_flight.release()
+
+            async for telemetry in paced_rows:
+                await in_flight.acquire()
+                task = asyncio.create_task(send(telemetry))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            if pending:
+                await asyncio.wait(set(pending))
+
+        self.elapsed = time.time() - self.start_time
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "mode": "async",
+            "sent": self.total_sent,
+            "errors": self.total_errors,
+            "elapsed_s": round(self.elapsed, 3),
+            "rate_per_s": round(self.total_sent / self.elapsed, 1) if self.elapsed > 0 else 0.0,
+            "concurrency": self.concurrency,
+            "connections": self.connections
+        }
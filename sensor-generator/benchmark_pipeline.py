@@ -0,0 +1,274 @@
+"""
+End-to-end latency benchmark for the telemetry pipeline.
+
+Injects tagged synthetic samples into the datamanager over gRPC at a fixed rate and
+timestamps every sample as it passes each stage:
+
+  create      CreateTelemetry returned (row stored in postgres)
+  raw         sample seen on the MQTT raw topic (datamanager -> broker)
+  event       event for the sample seen on the MQTT events topic (event manager)
+  prediction  lap prediction seen on NATS, measured from the lap's last sample;
+              this includes the analytics service's LAP_COMPLETION_THRESHOLD idle wait
+
+Prints p50/p99 latency and sustained throughput per stage as JSON.
+The services under test must already be running against the same mosquitto,
+nats-server and postgres instances.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import grpc
+import nats
+import paho.mqtt.client as mqtt
+
+from async_streamer import TokenBucket
+from fast_csv import iter_columns_telemetry
+from grpc_streamer import dto_to_proto
+from synthetic import generate_synthetic_columns, positive_float, positive_int
+import telemetry_pb2, telemetry_pb2_grpc  # on sys.path once grpc_streamer is imported
+
+
+def sample_key(driver: str, timestamp_utc: str) -> Tuple[str, int]:
+    """(driver, epoch microseconds); stages format the timestamp differently, so compare instants"""
+    epoch = datetime.fromisoformat(timestamp_utc.replace("Z", "+00:00")).timestamp()
+    return driver, round(epoch * 1e6)
+
+
+def latency_stats(latencies: List[float], arrivals: List[float]) -> Dict[str, Any]:
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+    span = max(arrivals) - min(arrivals) if len(arrivals) > 1 else 0.0
+    return {
+        "count": len(ordered),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "throughput_per_s": round(len(arrivals) / span, 1) if span > 0 else None
+    }
+
+
+class StageRecorder:
+    """Collects (arrival time, payload) per stage; payloads are parsed after the run"""
+
+    def __init__(self):
+        self.arrivals: Dict[str, List[Tuple[float, bytes]]] = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, payload: bytes):
+        now = time.perf_counter()
+        with self.lock:
+            self.arrivals[stage].append((now, payload))
+
+
+class PipelineBenchmark:
+
+    def __init__(self, args):
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:6]
+        self.recorder = StageRecorder()
+
+        self.sent: Dict[Tuple[str, int], float] = {}
+        self.created: Dict[Tuple[str, int], float] = {}
+        self.lap_last_sent: Dict[Tuple[str, int], float] = {}
+        self.create_errors = 0
+
+    def start_mqtt(self) -> mqtt.Client:
+        client = mqtt.Client(client_id=f"pipeline-bench-{self.run_id}", clean_session=True)
+        subscribed = threading.Event()
+        topics = {self.args.raw_topic: "raw", self.args.events_topic: "event"}
+
+        def on_connect(client, userdata, flags, rc):
+            client.subscribe([(topic, self.args.qos) for topic in topics])
+
+        def on_subscribe(client, userdata, mid, granted_qos):
+            subscribed.set()
+
+        def on_message(client, userdata, message):
+            self.recorder.record(topics.get(message.topic, message.topic), message.payload)
+
+        client.on_connect = on_connect
+        client.on_subscribe = on_subscribe
+        client.on_message = on_message
+        client.connect(self.args.mqtt_host, self.args.mqtt_port, keepalive=30)
+        client.loop_start()
+        if not subscribed.wait(10):
+            raise RuntimeError(f"Could not subscribe on MQTT {self.args.mqtt_host}:{self.args.mqtt_port}")
+        return client
+
+    async def start_nats(self):
+        nc = await nats.connect(self.args.nats_url)
+
+        async def on_prediction(msg):
+            data = msg.data
+            if msg.headers and msg.headers.get("Content-Encoding") == "deflate":
+                data = zlib.decompress(data)
+            self.recorder.record("prediction", data)
+
+        await nc.subscribe(self.args.nats_subject, cb=on_prediction)
+        await nc.flush()
+        return nc
+
+    def build_samples(self) -> List[Dict[str, Any]]:
+        start = datetime.now(timezone.utc).isoformat()
+        columns = generate_synthetic_columns(self.args.cars, self.args.laps, self.args.hz, self.args.seed, start=start)
+        columns["driver"] = columns["driver"].astype(object) + f"-{self.run_id}"
+        rows = list(iter_columns_telemetry(columns))
+        return rows[:self.args.samples] if self.args.samples > 0 else rows
+
+    async def inject(self, samples: List[Dict[str, Any]]):
+        bucket = TokenBucket(self.args.rate, max(1, self.args.rate // 100))
+        in_flight = asyncio.Semaphore(self.args.concurrency)
+        pending = set()
+
+        async with grpc.aio.insecure_channel(self.args.grpc_target) as channel:
+            stub = telemetry_pb2_grpc.TelemetryServiceStub(channel)
+
+            async def create(key, proto):
+                try:
+                    response = await stub.CreateTelemetry(
+                        telemetry_pb2.CreateTelemetryRequest(telemetry=proto), timeout=10
+                    )
+                    if response.success:
+                        self.created[key] = time.perf_counter()
+                    else:
+                        self.create_errors += 1
+                except grpc.aio.AioRpcError:
+                    self.create_errors += 1
+                finally:
+                    in_flight.release()
+
+            for sample in samples:
+                key = sample_key(sample["driver"], sample["timestampUtc"])
+                proto = dto_to_proto(sample)
+                await bucket.acquire()
+                await in_flight.acquire()
+                now = time.perf_counter()
+                self.sent[key] = now
+                self.lap_last_sent[(sample["driver"], sample["lapNumber"])] = now
+                task = asyncio.create_task(create(key, proto))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            if pending:
+                await asyncio.wait(set(pending))
+
+    def match(self) -> Dict[str, Dict[str, Any]]:
+        stages = {}
+        created = sorted(self.created.items())
+        stages["create"] = latency_stats(
+            [done - self.sent[key] for key, done in created], [done for _, done in created]
+        )
+
+        for stage in ("raw", "event"):
+            latencies, arrivals, foreign = [], [], 0
+            for arrived, payload in self.recorder.arrivals[stage]:
+                try:
+                    message = json.loads(payload)
+                    key = sample_key(message["driver"], message["timestampUtc"])
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    foreign += 1
+                    continue
+                if key not in self.sent:
+                    foreign += 1
+                    continue
+                latencies.append(arrived - self.sent[key])
+                arrivals.append(arrived)
+            stages[stage] = {**latency_stats(latencies, arrivals), "ignored": foreign}
+
+        latencies, arrivals = [], []
+        for arrived, payload in self.recorder.arrivals["prediction"]:
+            try:
+                message = json.loads(payload)
+                lap = (message["driver"], message["lap_number"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            if lap in self.lap_last_sent:
+                latencies.append(arrived - self.lap_last_sent[lap])
+                arrivals.append(arrived)
+        stages["prediction"] = {**latency_stats(latencies, arrivals), "laps_sent": len(self.lap_last_sent)}
+
+        stages["raw"]["lost"] = len(self.created) - stages["raw"]["count"]
+        return stages
+
+    async def run(self) -> Dict[str, Any]:
+        samples = self.build_samples()
+        mqtt_client = self.start_mqtt()
+        nc = await self.start_nats()
+        try:
+            started = time.perf_counter()
+            await self.inject(samples)
+            inject_seconds = time.perf_counter() - started
+
+            # Events and predictions trail the last sample; predictions wait for laps to go idle
+            await asyncio.sleep(self.args.drain)
+        finally:
+            mqtt_client.loop_stop()
+            mqtt_client.disconnect()
+            await nc.close()
+
+        return {
+            "run_id": self.run_id,
+            "config": {
+                "samples": len(samples),
+                "rate": self.args.rate,
+                "concurrency": self.args.concurrency,
+                "cars": self.args.cars,
+                "laps": self.args.laps,
+                "hz": self.args.hz,
+                "grpc_target": self.args.grpc_target
+            },
+            "inject": {
+                "sent": len(self.sent),
+                "errors": self.create_errors,
+                "elapsed_s": round(inject_seconds, 3),
+                "rate_per_s": round(len(self.sent) / inject_seconds, 1) if inject_seconds > 0 else None
+            },
+            "stages": self.match()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-stage latency through the telemetry pipeline")
+    parser.add_argument("--grpc-target", default="localhost:50051", help="Datamanager gRPC address (default: localhost:50051)")
+    parser.add_argument("--mqtt-host", default="localhost", help="MQTT broker host (default: localhost)")
+    parser.add_argument("--mqtt-port", type=int, default=1883, help="MQTT broker port (default: 1883)")
+    parser.add_argument("--raw-topic", default="telemetry/raw", help="Raw telemetry topic (default: telemetry/raw)")
+    parser.add_argument("--events-topic", default="telemetry/events", help="Events topic (default: telemetry/events)")
+    parser.add_argument("--qos", type=int, default=1, help="MQTT subscription QoS (default: 1)")
+    parser.add_argument("--nats-url", default="nats://localhost:4222", help="NATS server (default: nats://localhost:4222)")
+    parser.add_argument("--nats-subject", default="telemetry.predictions", help="Prediction subject (default: telemetry.predictions)")
+    parser.add_argument("--rate", type=int, default=200, help="Samples per second to inject (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum in-flight CreateTelemetry calls (default: 32)")
+    parser.add_argument("--samples", type=int, default=-1, help="Stop after this many samples (-1 for all generated, default: -1)")
+    parser.add_argument("--cars", type=positive_int, default=10, help="Synthetic cars (default: 10)")
+    parser.add_argument("--laps", type=positive_int, default=2, help="Synthetic laps per car (default: 2)")
+    parser.add_argument("--hz", type=positive_float, default=4.0, help="Synthetic samples per second per car (default: 4)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed (default: 0)")
+    parser.add_argument("--drain", type=float, default=15.0,
+                        help="Seconds to keep listening after the last sample, longer than the lap idle threshold (default: 15)")
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(PipelineBenchmark(args).run())
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+REQUIRED_COLUMNS = ['driver', 'timestamp', 'LapNumber', 'X', 'Y',
+                    'Speed', 'Throttle', 'Brake', 'nGear', 'RPM', 'DRS']
+FLOAT_COLUMNS = ['X', 'Y', 'Speed', 'Throttle', 'RPM']
+TRUE_VALUES = ['true', '1', 'yes', 'on']
+# Recorded DRS status codes 10, 12 and 14 mean the flap is open; "1" is a closed status there, not a boolean
+DRS_OPEN_CODE = 10
+DRS_TRUE_VALUES = ['true', 'yes', 'on']
+
+CACHE_VERSION = 2
+
+
+def _to_float(values: pd.Series) -> np.ndarray:
+    # to_numeric finds the unparsable cells; its fast parser may differ from float() in the last bit,
+    # so valid cells are converted again exactly
+    parsed = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    valid = ~np.isnan(parsed)
+    parsed[valid] = values.to_numpy()[valid].astype(np.float64)
+    return parsed
+
+
+def _parse_chunk(chunk: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], int]:
+    """Convert one chunk column by column, with the same rules as TelemetryStreamer.csv_row_to_dto"""
+    timestamps = pd.to_datetime(chunk['timestamp'], format='ISO8601', errors='coerce', utc=True)
+    lap_number = pd.to_numeric(chunk['LapNumber'], errors='coerce')
+    n_gear = pd.to_numeric(chunk['nGear'], errors='coerce')
+    floats = {col: _to_float(chunk[col]) for col in FLOAT_COLUMNS}
+
+    valid = timestamps.notna() & lap_number.notna() & (lap_number == lap_number.round()) & n_gear.notna()
+    valid = valid.to_numpy(copy=True)
+    for values in floats.values():
+        valid &= ~np.isnan(values)
+
+    columns = {
+        'driver': chunk['driver'].str.strip().to_numpy(dtype=str)[valid],
+        'timestamp_ns': timestamps.dt.tz_localize(None).to_numpy('datetime64[ns]').view(np.int64)[valid],
+        'LapNumber': lap_number.to_numpy()[valid].astype(np.int64),
+        'nGear': n_gear.to_numpy()[valid].astype(np.int64),
+        'Brake': chunk['Brake'].str.strip().str.lower().isin(TRUE_VALUES).to_numpy()[valid],
+        'DRS': ((pd.to_numeric(chunk['DRS'], errors='coerce') >= DRS_OPEN_CODE)
+                | chunk['DRS'].str.strip().str.lower().isin(DRS_TRUE_VALUES)).to_numpy()[valid]
+    }
+    for col, values in floats.items():
+        columns[col] = values[valid]
+
+    return columns, int((~valid).sum())
+
+
+def _cache_key(csv_path: str) -> np.ndarray:
+    stat = os.stat(csv_path)
+    return np.array([CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def load_cache(cache_path: str, csv_path: str) -> Optional[Dict[str, np.ndarray]]:
+    """Return cached columns if the cache was built from the current version of csv_path"""
+    if not os.path.exists(cache_path):
+        return None
+    with np.load(cache_path, allow_pickle=False) as cached:
+        if not np.array_equal(cached['source_key'], _cache_key(csv_path)):
+            return None
+        return {name: cached[name] for name in cached.files if name != 'source_key'}
+
+
+def write_cache(cache_path: str, csv_path: str, columns: Dict[str, np.ndarray]):
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, source_key=_cache_key(csv_path), **columns)
+    os.replace(tmp_path, cache_path)
+
+
+def load_telemetry_columns(csv_path: str, limit: int = -1, chunk_rows: int = 200_000,
+                           cache_path: Optional[str] = None) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Parse the telemetry CSV into typed column arrays, reading it in chunks.
+    Returns (columns, invalid row count). With cache_path the whole file is parsed
+    once and stored as .npz; later runs load the arrays directly.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+
+    if cache_path:
+        cached = load_cache(cache_path, csv_path)
+        if cached is not None:
+            invalid = int(cached.pop('invalid_rows'))
+            return _head(cached, limit), invalid
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing = set(REQUIRED_COLUMNS) - set(header)
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    parts = []
+    invalid = 0
+    rows = 0
+    for chunk in pd.read_csv(csv_path, usecols=REQUIRED_COLUMNS, dtype=str,
+                             keep_default_na=False, chunksize=chunk_rows):
+        columns, chunk_invalid = _parse_chunk(chunk)
+        parts.append(columns)
+        invalid += chunk_invalid
+        rows += len(columns['driver'])
+        # Without a cache there is no reason to parse past the rows that will be sent
+        if not cache_path and 0 < limit <= rows:
+            break
+
+    if parts:
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    else:
+        columns, _ = _parse_chunk(pd.DataFrame({col: pd.Series(dtype=str) for col in REQUIRED_COLUMNS}))
+
+    if cache_path:
+        write_cache(cache_path, csv_path, {**columns, 'invalid_rows': np.int64(invalid)})
+
+    return _head(columns, limit), invalid
+
+
+def _head(columns: Dict[str, np.ndarray], limit: int) -> Dict[str, np.ndarray]:
+    if limit > 0:
+        return {name: values[:limit] for name, values in columns.items()}
+    return columns
+
+
+def iter_columns_telemetry(columns: Dict[str, np.ndarray]) -> Iterator[Dict[str, Any]]:
+    """Build the gateway DTOs from parsed columns"""
+    timestamps = (
+        pd.to_datetime(columns['timestamp_ns'], utc=True).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    )
+    for row in zip(columns['driver'].tolist(), timestamps.tolist(), columns['LapNumber'].tolist(),
+                   columns['X'].tolist(), columns['Y'].tolist(), columns['Speed'].tolist(),
+                   columns['Throttle'].tolist(), columns['Brake'].tolist(), columns['nGear'].tolist(),
+                   columns['RPM'].tolist(), columns['DRS'].tolist()):
+        yield {
+            "driver": row[0],
+            "timestampUtc": row[1],
+            "lapNumber": row[2],
+            "x": row[3],
+            "y": row[4],
+            "speed": row[5],
+            "throttle": row[6],
+            "brake": row[7],
+            "nGear": row[8],
+            "rpm": row[9],
+            "drs": row[10]
+        }
+
+
+def iter_columns_timed(columns: Dict[str, np.ndarray]) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """(epoch seconds, DTO) pairs in timestamp order, drivers interleaved as recorded"""
+    order = np.argsort(columns['timestamp_ns'], kind='stable')
+    ordered = {name: values[order] for name, values in columns.items()}
+    epochs = (ordered['timestamp_ns'] / 1e9).tolist()
+    return zip(epochs, iter_columns_telemetry(ordered))
@@ -0,0 +1,207 @@
+import asyncio
+import pathlib
+import sys
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Set, Tuple
+
+import grpc
+
+# Stubs are generated into ./gen in the image; locally the ones from datamanager-py/generate_grpc.py work too
+_here = pathlib.Path(__file__).parent
+sys.path.insert(0, str(_here.parent.joinpath("datamanager-py", "gen")))
+sys.path.insert(0, str(_here.joinpath("gen")))
+import telemetry_pb2, telemetry_pb2_grpc
+
+from async_streamer import TokenBucket
+
+
+# Only codes for calls the server did not run; after DEADLINE_EXCEEDED the rows may
+# already be stored, and sending them again would duplicate them
+RETRYABLE_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.RESOURCE_EXHAUSTED
+)
+
+# Distinct failure reasons kept for the report
+MAX_ERROR_MESSAGES = 10
+
+
+def dto_to_proto(telemetry: Dict[str, Any]) -> telemetry_pb2.Telemetry:
+    t = telemetry_pb2.Telemetry(
+        driver=telemetry["driver"],
+        lap_number=telemetry["lapNumber"],
+        x=telemetry["x"],
+        y=telemetry["y"],
+        speed=telemetry["speed"],
+        throttle=telemetry["throttle"],
+        brake=telemetry["brake"],
+        n_gear=telemetry["nGear"],
+        rpm=telemetry["rpm"],
+        drs=telemetry["drs"]
+    )
+    t.timestamp.FromJsonString(telemetry["timestampUtc"])
+    return t
+
+
+class GrpcTelemetryStreamer:
+    """
+    Sends rows straight to the datamanager's TelemetryService, skipping the gateway's REST hop.
+    With batch_size 1 every row is a unary CreateTelemetry call; larger batches go through
+    CreateTelemetryBatch. Up to `concurrency` calls are in flight on one HTTP/2 channel.
+    """
+
+    def __init__(self, target: str, rate: int = 50, burst: int = 1, concurrency: int = 64,
+                 batch_size: int = 100, linger: float = 0.02, max_retries: int = 3, timeout: float = 10.0):
+        self.target = target
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.total_sent = 0
+        self.total_errors = 0
+        self.total_calls = 0
+        self.error_messages: Counter = Counter()
+        self.start_time = None
+        self.elapsed = 0.0
+
+    async def send_batch(self, stub: telemetry_pb2_grpc.TelemetryServiceStub, batch: List[Dict[str, Any]]) -> bool:
+        protos = [dto_to_proto(telemetry) for telemetry in batch]
+
+        for attempt in range(self.max_retries):
+            try:
+                self.total_calls += 1
+                if len(protos) == 1:
+                    response = await stub.CreateTelemetry(
+                        telemetry_pb2.CreateTelemetryRequest(telemetry=protos[0]), timeout=self.timeout
+                    )
+                else:
+                    response = await stub.CreateTelemetryBatch(
+                        telemetry_pb2.CreateTelemetryBatchRequest(telemetries=protos), timeout=self.timeout
+                    )
+
+                if response.success:
+                    self.total_sent += len(protos)
+                    return True
+                self._record_error(response.message or "success=false", len(protos))
+                return False
+
+            except grpc.aio.AioRpcError as e:
+                error = f"{e.code().name}: {e.details()}"
+                if e.code() not in RETRYABLE_CODES:
+                    break
+                await asyncio.sleep(2 ** attempt)
+
+        self._record_error(error, len(protos))
+        return False
+
+    def _record_error(self, message: str, rows: int):
+        self.total_errors += rows
+        if message in self.error_messages or len(self.error_messages) < MAX_ERROR_MESSAGES:
+            self.error_messages[message] += rows
+
+    async def stream(self, telemetry_rows: Iterable[Dict[str, Any]]):
+        """Send rows as fast as the token bucket allows"""
+        bucket = TokenBucket(self.rate, self.burst)
+
+        async def paced():
+            for telemetry in telemetry_rows:
+                await bucket.acquire()
+                yield telemetry
+
+        await self._send_all(paced())
+
+    async def replay(self, timed_rows: Iterable[Tuple[float, Dict[str, Any]]], pacer):
+        """Send (epoch, row) pairs when the pacer releases them"""
+
+        async def paced():
+            for epoch, telemetry in timed_rows:
+                await pacer.wait(epoch)
+                yield telemetry
+
+        await self._send_all(paced())
+
+    async def _batches(self, queue: asyncio.Queue) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Group queued rows into batches, flushing a partial batch once its first row waited `linger`"""
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            first = await queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = loop.time() + self.linger
+
+            while len(batch) < self.batch_size:
+                if queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = queue.get_nowait()
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+
+            yield batch
+
+    async def _send_all(self, paced_rows: AsyncIterator[Dict[str, Any]]):
+        in_flight = asyncio.Semaphore(self.concurrency)
+        pending: Set[asyncio.Task] = set()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+
+        async def produce():
+            try:
+                async for telemetry in paced_rows:
+                    await queue.put(telemetry)
+            finally:
+                await queue.put(None)
+
+        self.start_time = time.time()
+        async with grpc.aio.insecure_channel(self.target) as channel:
+            stub = telemetry_pb2_grpc.TelemetryServiceStub(channel)
+
+            async def send(batch):
+                try:
+                    await self.send_batch(stub, batch)
+                finally:
+                    in_flight.release()
+
+            producer = asyncio.create_task(produce())
+            try:
+                async for batch in self._batches(queue):
+                    await in_flight.acquire()
+                    task = asyncio.create_task(send(batch))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                await producer
+            finally:
+                producer.cancel()
+
+            if pending:
+                await asyncio.wait(set(pending))
+
+        self.elapsed = time.time() - self.start_time
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "mode": "grpc",
+            "target": self.target,
+            "sent": self.total_sent,
+            "errors": self.total_errors,
+            "calls": self.total_calls,
+            "elapsed_s": round(self.elapsed, 3),
+            "rate_per_s": round(self.total_sent / self.elapsed, 1) if self.elapsed > 0 else 0.0,
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "error_messages": dict(self.error_messages.most_common())
+        }
@@ -0,0 +1,72 @@
+import asyncio
+import heapq
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+def telemetry_epoch(telemetry: Dict[str, Any]) -> float:
+    return datetime.fromisoformat(telemetry["timestampUtc"].replace("Z", "+00:00")).timestamp()
+
+
+def merge_driver_streams(telemetry_rows: Iterable[Dict[str, Any]]) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """
+    Split rows into per-driver streams, order each by timestamp and k-way merge them
+    with a heap, so drivers are interleaved the way they were recorded.
+    Yields (epoch seconds, row).
+    """
+    streams: Dict[str, List[Tuple[float, Dict[str, Any]]]] = defaultdict(list)
+    for telemetry in telemetry_rows:
+        streams[telemetry["driver"]].append((telemetry_epoch(telemetry), telemetry))
+
+    for stream in streams.values():
+        stream.sort(key=lambda item: item[0])
+
+    return heapq.merge(*streams.values(), key=lambda item: item[0])
+
+
+class TimestampPacer:
+    """
+    Releases rows at their original timestamps divided by `speed` (0 = as fast as possible)
+    and records how late each row was released relative to its schedule.
+    """
+
+    def __init__(self, speed: float = 1.0):
+        self.speed = speed
+        self.wall_start = None
+        self.data_start = None
+        self.data_end = None
+        self.lags: List[float] = []
+
+    async def wait(self, epoch: float):
+        now = time.monotonic()
+        if self.wall_start is None:
+            self.wall_start = now
+            self.data_start = epoch
+        self.data_end = epoch
+
+        if self.speed <= 0:
+            return
+
+        due = self.wall_start + (epoch - self.data_start) / self.speed
+        if due > now:
+            await asyncio.sleep(due - now)
+            now = time.monotonic()
+        self.lags.append(max(0.0, now - due))
+
+    def report(self) -> Dict[str, Any]:
+        report = {
+            "speed": self.speed,
+            "data_span_s": round((self.data_end or 0) - (self.data_start or 0), 3),
+            "wall_span_s": round(time.monotonic() - self.wall_start, 3) if self.wall_start else 0.0
+        }
+        if self.lags:
+            lags = sorted(self.lags)
+            report.update({
+                "lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+                "lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+                "lag_max_ms": round(lags[-1] * 1000, 2),
+                "late_over_100ms": sum(1 for lag in lags if lag > 0.1)
+            })
+        return report
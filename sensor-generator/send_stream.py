@@ -1,15 +1,25 @@
 import argparse
+import asyncio
 import csv
+import json
 import logging
 import sys
 import time
 from datetime import timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List
 from pathlib import Path
 
 import requests
 from dateutil import parser as date_parser
 
+from async_streamer import AsyncTelemetryStreamer
+from replay import TimestampPacer, merge_driver_streams
+from fast_csv import DRS_OPEN_CODE, DRS_TRUE_VALUES, iter_columns_telemetry, iter_columns_timed, load_telemetry_columns
+from synthetic import generate_synthetic_columns, positive_float, positive_int
+
+# The datamanager's default CREATE_BATCH_MAX; larger CreateTelemetryBatch calls are refused whole
+CREATE_BATCH_MAX = 10000
+
 logging.basicConfig(level=logging.CRITICAL)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.CRITICAL)
@@ -31,6 +41,7 @@ class TelemetryStreamer:
         self.total_sent = 0
         self.total_errors = 0
         self.start_time = None
+        self.elapsed = 0.0
     
     def parse_boolean(self, value: str) -> bool:
         if isinstance(value, bool):
@@ -38,6 +49,15 @@ class TelemetryStreamer:
         value_str = str(value).strip().lower()
         return value_str in ('true', '1', 'yes', 'on')
     
+    def parse_drs(self, value: str) -> bool:
+        if isinstance(value, bool):
+            return value
+        value_str = str(value).strip().lower()
+        try:
+            return float(value_str) >= DRS_OPEN_CODE
+        except ValueError:
+            return value_str in DRS_TRUE_VALUES
+    
     def parse_timestamp(self, timestamp_str: str) -> str:
         try:
             dt = date_parser.parse(timestamp_str)
@@ -65,7 +85,7 @@ class TelemetryStreamer:
                 "brake": self.parse_boolean(row["Brake"]),
                 "nGear": int(float(row["nGear"])),  
                 "rpm": float(row["RPM"]),
-                "drs": self.parse_boolean(row["DRS"])
+                "drs": self.parse_drs(row["DRS"])
             }
         except (ValueError, KeyError) as e:
             raise
@@ -106,54 +126,79 @@ class TelemetryStreamer:
         self.total_errors += 1
         return False
     
-    def stream_csv(self, csv_path: str, limit: int = -1):
+    def iter_csv_telemetry(self, csv_path: str, limit: int = -1) -> Iterator[Dict[str, Any]]:
         csv_file = Path(csv_path)
         if not csv_file.exists():
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
         
+        rows_processed = 0
+        
+        with open(csv_file, 'r', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            
+            required_cols = {'driver', 'timestamp', 'LapNumber', 'X', 'Y', 
+                           'Speed', 'Throttle', 'Brake', 'nGear', 'RPM', 'DRS'}
+            if not required_cols.issubset(reader.fieldnames or []):
+                missing = required_cols - set(reader.fieldnames or [])
+                raise ValueError(f"Missing required columns: {missing}")
+            
+            for row in reader:
+                if limit > 0 and rows_processed >= limit:
+                    break
+                
+                try:
+                    telemetry_dto = self.csv_row_to_dto(row)
+                except Exception as e:
+                    self.total_errors += 1
+                    continue
+                
+                rows_processed += 1
+                yield telemetry_dto
+    
+    def stream_csv(self, csv_path: str, limit: int = -1):
+        self.stream_rows(self.iter_csv_telemetry(csv_path, limit))
+    
+    def stream_rows(self, telemetry_rows: Iterable[Dict[str, Any]]):
         self.start_time = time.time()
         batch = []
-        rows_processed = 0
         
         sleep_time = self.burst / self.rate if self.rate > 0 else 0
         
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                required_cols = {'driver', 'timestamp', 'LapNumber', 'X', 'Y', 
-                               'Speed', 'Throttle', 'Brake', 'nGear', 'RPM', 'DRS'}
-                if not required_cols.issubset(reader.fieldnames or []):
-                    missing = required_cols - set(reader.fieldnames or [])
-                    raise ValueError(f"Missing required columns: {missing}")
-                
-                for row in reader:
-                    if limit > 0 and rows_processed >= limit:
-                        break
-                    
-                    try:
-                        telemetry_dto = self.csv_row_to_dto(row)
-                        batch.append(telemetry_dto)
-                        rows_processed += 1
-                        
-                        if len(batch) >= self.burst:
-                            self.send_telemetry_batch(batch)
-                            batch = []
-                            
-                            if sleep_time > 0:
-                                time.sleep(sleep_time)
-                    
-                    except Exception as e:
-                        self.total_errors += 1
-                        continue
+            for telemetry_dto in telemetry_rows:
+                batch.append(telemetry_dto)
                 
-                if batch:
+                if len(batch) >= self.burst:
                     self.send_telemetry_batch(batch)
+                    batch = []
+                    
+                    if sleep_time > 0:
+                        time.sleep(sleep_time)
+            
+            if batch:
+                self.send_telemetry_batch(batch)
         
         except Exception as e:
             raise
         
-        elapsed = time.time() - self.start_time
+        self.elapsed = time.time() - self.start_time
+    
+    def report(self) -> Dict[str, Any]:
+        return {
+            "mode": "sync",
+            "sent": self.total_sent,
+            "errors": self.total_errors,
+            "elapsed_s": round(self.elapsed, 3),
+            "rate_per_s": round(self.total_sent / self.elapsed, 1) if self.elapsed > 0 else 0.0
+        }
+
+
+def grpc_batch_size(value: str) -> int:
+    """argparse type for --grpc-batch"""
+    size = int(value)
+    if not 1 <= size <= CREATE_BATCH_MAX:
+        raise argparse.ArgumentTypeError(f"must be between 1 and {CREATE_BATCH_MAX}, got {value}")
+    return size
 
 
 def main():
@@ -162,8 +207,7 @@ def main():
     )
     parser.add_argument(
         "--path", 
-        required=True, 
-        help="Path to CSV file with telemetry data"
+        help="Path to CSV file with telemetry data (not needed with --synthetic)"
     )
     parser.add_argument(
         "--base-url", 
@@ -188,6 +232,82 @@ def main():
         default=-1,
         help="Maximum number of records to process (-1 for all, default: -1)"
     )
+    parser.add_argument(
+        "--mode",
+        choices=["sync", "async", "replay", "grpc"],
+        default="sync",
+        help="sync posts one row at a time; async keeps many requests in flight; "
+             "replay sends rows at their original timestamps; "
+             "grpc sends straight to the datamanager, bypassing the gateway (default: sync)"
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed multiplier, e.g. 10 for 10x, 0 for as fast as possible (default: 1)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=64,
+        help="Maximum in-flight requests in async mode (default: 64)"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=32,
+        help="Keep-alive connection pool size in async mode (default: 32)"
+    )
+    parser.add_argument(
+        "--grpc-target",
+        help="Datamanager gRPC address for grpc mode (default: datamanager:50051); "
+             "in replay mode it sends over gRPC instead of REST"
+    )
+    parser.add_argument(
+        "--grpc-batch",
+        type=grpc_batch_size,
+        default=100,
+        help="Rows per CreateTelemetryBatch call, 1 for unary CreateTelemetry calls, "
+             f"at most the datamanager's CREATE_BATCH_MAX of {CREATE_BATCH_MAX} (default: 100)"
+    )
+    parser.add_argument(
+        "--fast-parse",
+        action="store_true",
+        help="Parse the CSV column-wise in chunks with pandas instead of row by row"
+    )
+    parser.add_argument(
+        "--cache",
+        help="Binary .npz cache of the parsed CSV, created on first use (implies --fast-parse)"
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Generate telemetry for a synthetic track instead of reading a CSV"
+    )
+    parser.add_argument(
+        "--cars",
+        type=positive_int,
+        default=20,
+        help="Number of cars in synthetic mode (default: 20)"
+    )
+    parser.add_argument(
+        "--laps",
+        type=positive_int,
+        default=5,
+        help="Laps per car in synthetic mode (default: 5)"
+    )
+    parser.add_argument(
+        "--hz",
+        type=positive_float,
+        default=4.0,
+        help="Samples per second per car in synthetic mode (default: 4)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for the synthetic track and cars (default: 0)"
+    )
     parser.add_argument(
         "--verbose", 
         action="store_true",
@@ -195,6 +315,8 @@ def main():
     )
     
     args = parser.parse_args()
+    if not args.path and not args.synthetic:
+        parser.error("--path is required unless --synthetic is given")
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -206,10 +328,55 @@ def main():
             burst=args.burst
         )
         
-        streamer.stream_csv(
-            csv_path=args.path,
-            limit=args.limit
-        )
+        if args.synthetic:
+            columns = generate_synthetic_columns(args.cars, args.laps, args.hz, args.seed)
+            if args.limit > 0:
+                columns = {name: values[:args.limit] for name, values in columns.items()}
+            rows = iter_columns_telemetry(columns)
+            timed_rows = iter_columns_timed(columns) if args.mode == "replay" else None
+        elif args.fast_parse or args.cache:
+            columns, invalid_rows = load_telemetry_columns(args.path, args.limit, cache_path=args.cache)
+            streamer.total_errors += invalid_rows
+            rows = iter_columns_telemetry(columns)
+            timed_rows = iter_columns_timed(columns) if args.mode == "replay" else None
+        else:
+            rows = streamer.iter_csv_telemetry(args.path, args.limit)
+            timed_rows = merge_driver_streams(rows) if args.mode == "replay" else None
+        
+        if args.mode == "grpc" or (args.mode == "replay" and args.grpc_target):
+            from grpc_streamer import GrpcTelemetryStreamer
+            async_streamer = GrpcTelemetryStreamer(
+                target=args.grpc_target or "datamanager:50051",
+                rate=args.rate,
+                burst=args.burst,
+                concurrency=args.concurrency,
+                batch_size=args.grpc_batch
+            )
+        elif args.mode in ("async", "replay"):
+            async_streamer = AsyncTelemetryStreamer(
+                base_url=args.base_url,
+                rate=args.rate,
+                burst=args.burst,
+                concurrency=args.concurrency,
+                connections=args.connections
+            )
+        
+        if args.mode in ("async", "replay", "grpc"):
+            if args.mode == "replay":
+                pacer = TimestampPacer(args.speed)
+                asyncio.run(async_streamer.replay(timed_rows, pacer))
+                report = {**async_streamer.report(), "mode": "replay",
+                          "transport": "grpc" if args.grpc_target else "rest", "schedule": pacer.report()}
+            else:
+                asyncio.run(async_streamer.stream(rows))
+                report = async_streamer.report()
+            report["errors"] += streamer.total_errors
+        else:
+            streamer.stream_rows(rows)
+            report = streamer.report()
+        
+        if args.verbose:
+            print(json.dumps(report))
         
     except KeyboardInterrupt:
         logger.info("Streaming interrupted by user")
@@ -0,0 +1,148 @@
+import argparse
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+TRACK_POINTS = 2000
+TRACK_RADIUS = 11000.0      # same units as the recorded X/Y (1/10 m)
+MAX_SPEED = 330.0           # km/h
+MIN_SPEED = 70.0
+LATERAL_GRIP = 4.5 * 9.81   # m/s^2 a car can hold in a corner
+BRAKING_DISTANCE = 0.03     # share of the lap spent braking into a corner
+GEAR_TOP_SPEEDS = np.array([95.0, 130.0, 165.0, 200.0, 235.0, 265.0, 295.0, 340.0])
+MAX_RPM = 12000.0
+DRS_MIN_LAP = 3
+
+
+def positive_int(value: str) -> int:
+    """argparse type for --cars and --laps"""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+def positive_float(value: str) -> float:
+    """argparse type for --hz"""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {value}")
+    return number
+
+
+def build_track(seed: int = 0, points: int = TRACK_POINTS) -> Dict[str, np.ndarray]:
+    """
+    A closed circuit sampled at `points` positions: straights joined by rounded corners
+    at random positions around a loop, plus the speed profile a car can drive around it.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Straights between random corners around a loop, resampled evenly along the perimeter
+    corners = 14
+    angle = np.sort(rng.uniform(0.0, 2 * np.pi, corners))
+    radius = TRACK_RADIUS * rng.uniform(0.55, 1.0, corners)
+    vx = np.append(radius * np.cos(angle), radius[0] * np.cos(angle[0]))
+    vy = np.append(0.7 * radius * np.sin(angle), 0.7 * radius[0] * np.sin(angle[0]))
+    edge = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(vx), np.diff(vy)))])
+    along = np.linspace(0.0, edge[-1], points, endpoint=False)
+    x = np.interp(along, edge, vx)
+    y = np.interp(along, edge, vy)
+
+    # Rounding the vertices off turns them into corners of a few tens of metres radius
+    width = max(3, points // 80)
+    kernel = np.ones(width) / width
+    x = np.convolve(np.concatenate([x[-width:], x, x[:width]]), kernel, mode='same')[width:-width]
+    y = np.convolve(np.concatenate([y[-width:], y, y[:width]]), kernel, mode='same')[width:-width]
+
+    # Arc length and curvature of the closed curve
+    dx = np.gradient(np.concatenate([x[-2:], x, x[:2]]))[2:-2]
+    dy = np.gradient(np.concatenate([y[-2:], y, y[:2]]))[2:-2]
+    ddx = np.gradient(np.concatenate([dx[-2:], dx, dx[:2]]))[2:-2]
+    ddy = np.gradient(np.concatenate([dy[-2:], dy, dy[:2]]))[2:-2]
+    curvature = np.abs(dx * ddy - dy * ddx) / np.power(dx * dx + dy * dy, 1.5)
+    segment = np.hypot(np.diff(x, append=x[0]), np.diff(y, append=y[0])) / 10.0  # metres
+    distance = np.concatenate([[0.0], np.cumsum(segment)])
+
+    # Cornering limit v = sqrt(a / k), then look ahead so cars brake before a corner, and smooth
+    corner_limit = np.sqrt(LATERAL_GRIP / np.maximum(curvature * 10.0, 1e-9)) * 3.6
+    limit = np.clip(corner_limit, MIN_SPEED, MAX_SPEED)
+    ahead = max(1, int(points * BRAKING_DISTANCE))
+    window = np.lib.stride_tricks.sliding_window_view(np.concatenate([limit, limit[:ahead]]), ahead + 1)
+    speed = np.min(window, axis=1)[:points]
+    kernel = np.ones(ahead) / ahead
+    speed = np.convolve(np.concatenate([speed[-ahead:], speed, speed[:ahead]]), kernel, mode='same')[ahead:-ahead]
+
+    slope = np.gradient(np.concatenate([speed[-1:], speed, speed[:1]]))[1:-1]
+
+    return {
+        'x': x,
+        'y': y,
+        'distance': distance,       # points + 1 values, distance[-1] is the lap length
+        'speed': speed,
+        'slope': slope,
+        'straight': speed > 0.95 * MAX_SPEED
+    }
+
+
+def generate_synthetic_columns(cars: int = 20, laps: int = 5, hz: float = 4.0, seed: int = 0,
+                               start: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Telemetry for `cars` cars driving `laps` laps around one synthetic track, sampled at `hz`.
+    Returns the same column layout as fast_csv.load_telemetry_columns, with the cars interleaved in time order.
+    """
+    if cars <= 0 or laps <= 0 or not hz > 0:
+        raise ValueError(f"cars, laps and hz must be positive, got {cars}, {laps}, {hz}")
+
+    rng = np.random.default_rng(seed)
+    track = build_track(seed)
+    points = len(track['speed'])
+    start_ns = pd.Timestamp(start or '2024-01-01T14:00:00Z').value
+
+    parts = []
+    for car in range(cars):
+        # Each car has its own pace, and every lap varies a little around it
+        pace = rng.uniform(0.94, 1.0)
+        lap_pace = pace * (1 + rng.normal(0.0, 0.004, laps))
+
+        # Time to cover each track segment on each lap, then sample the cumulative clock at hz
+        segment_m = np.diff(track['distance'])
+        segment_s = segment_m[None, :] / (track['speed'][None, :] * lap_pace[:, None] / 3.6)
+        clock = np.concatenate([[0.0], np.cumsum(segment_s)])
+        position = np.arange(clock.size, dtype=np.float64)
+        samples = np.arange(0.0, clock[-1], 1.0 / hz)
+        at = np.interp(samples, clock, position)
+
+        lap = np.minimum((at // points).astype(np.int64), laps - 1)
+        index = (at % points).astype(np.int64)
+        n = samples.size
+
+        speed = track['speed'][index] * lap_pace[lap] + rng.normal(0.0, 1.5, n)
+        slope = track['slope'][index]
+        braking = slope < -2.0
+        throttle = np.where(braking, 0.0, np.clip(100.0 * (speed / MAX_SPEED) ** 0.5 + 25.0 * (slope > 0), 0.0, 100.0))
+        throttle = np.where(track['straight'][index], 100.0, throttle)
+        gear = np.clip(np.searchsorted(GEAR_TOP_SPEEDS, speed) + 1, 1, GEAR_TOP_SPEEDS.size)
+        gear_floor = np.concatenate([[0.0], GEAR_TOP_SPEEDS])[gear - 1]
+        rpm = MAX_RPM * (0.7 + 0.3 * (speed - gear_floor) / (GEAR_TOP_SPEEDS[gear - 1] - gear_floor))
+        drs = track['straight'][index] & (lap + 1 >= DRS_MIN_LAP)
+
+        offset = rng.normal(0.0, 8.0, (2, n))
+        parts.append({
+            'driver': np.full(n, f"CAR{car + 1:03d}"),
+            'timestamp_ns': start_ns + (samples * 1e9).astype(np.int64),
+            'LapNumber': lap + 1,
+            'X': track['x'][index] + offset[0],
+            'Y': track['y'][index] + offset[1],
+            'Speed': np.maximum(speed, 0.0),
+            'Throttle': throttle,
+            'Brake': braking,
+            'nGear': gear.astype(np.int64),
+            'RPM': np.clip(rpm + rng.normal(0.0, 80.0, n), 0.0, MAX_RPM + 500.0),
+            'DRS': drs
+        })
+
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.argsort(columns['timestamp_ns'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
@@ -0,0 +1,294 @@
+"""
+Lightweight instrumentation shared by the Python services.
+
+Metrics are plain in-process counters and fixed-bucket histograms, exposed in the
+Prometheus text format (render_prometheus, start_metrics_server). Recording is a
+lock and a few integer updates, cheap enough to stay on under load.
+
+Tracing is optional: with TRACING_ENABLED=true and the OpenTelemetry SDK installed,
+span() records spans exported over OTLP, and the W3C trace context travels in MQTT/NATS
+JSON payloads under TRACE_KEY and in HTTP headers. Otherwise span() is a no-op.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import profiling
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_KEY = "trace"
+
+# Seconds, from 50us to 10s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    __slots__ = ("name", "help", "value", "_lock")
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: "Histogram"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram:
+    __slots__ = ("name", "help", "buckets", "counts", "count", "sum", "_lock")
+
+    def __init__(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager that observes the time spent in its block"""
+        return _Timer(self)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else None,
+            "p50_ms_le": _ms(self.quantile(0.5)),
+            "p99_ms_le": _ms(self.quantile(0.99))
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+render_prometheus = REGISTRY.render_prometheus
+snapshot = REGISTRY.snapshot
+
+
+def timed(name: str, help: str = "") -> Callable:
+    """Decorator recording each call's duration in histogram `name`; works on sync and async functions"""
+    metric = histogram(name, help)
+
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(metric):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(metric):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            self._reply(200, render_prometheus(), {"Content-Type": "text/plain; version=0.0.4"})
+            return
+        # Profiles block this request's thread only; the server handles each request on its own
+        status, body, headers = profiling.handle_request(self.path)
+        self._reply(status, body, {"Content-Type": "text/plain", **headers})
+
+    def _reply(self, status: int, text: str, headers: Dict[str, str]):
+        body = text.encode()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics, and the profiling endpoints when enabled, on a daemon thread for
+    services without an HTTP API; port 0 disables it
+    """
+    if port <= 0:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Tracing
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_tracer = None
+_propagate = None
+
+
+def init_tracing(service_name: str) -> bool:
+    """Set up OTLP span export when TRACING_ENABLED=true and the OpenTelemetry SDK is installed"""
+    global _tracer, _propagate
+    if not TRACING_ENABLED or _tracer is not None:
+        return _tracer is not None
+    try:
+        from opentelemetry import propagate, trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        return False
+
+    resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)})
+    provider = TracerProvider(resource=resource)
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(service_name)
+    _propagate = propagate
+    return True
+
+
+def span(name: str, parent=None, attributes: Optional[Dict[str, Any]] = None):
+    """Current-context span, child of `parent` if given (see payload_context/header_context)"""
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_as_current_span(name, context=parent, attributes=attributes)
+
+
+def with_trace_context(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of payload carrying the current trace context, or payload itself when tracing is off"""
+    if _propagate is None:
+        return payload
+    carrier: Dict[str, str] = {}
+    _propagate.inject(carrier)
+    return {**payload, TRACE_KEY: carrier} if carrier else payload
+
+
+def payload_context(payload: Dict[str, Any]):
+    """Trace context carried by a received payload, as a span parent"""
+    if _propagate is None:
+        return None
+    carrier = payload.get(TRACE_KEY)
+    return _propagate.extract(carrier) if isinstance(carrier, dict) else None
+
+
+def inject_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    if _propagate is not None:
+        _propagate.inject(headers)
+    return headers
+
+
+def header_context(headers):
+    return _propagate.extract(dict(headers)) if _propagate is not None else None
@@ -0,0 +1,187 @@
+"""
+On-demand profiling for live services, off unless PROFILING_ENABLED=true.
+
+profile_cpu samples every thread's Python stack with sys._current_frames for a bounded
+window; profile_allocations diffs two tracemalloc snapshots taken a window apart. Both
+return folded stacks ("root;...;leaf weight" per line) that flamegraph.pl, speedscope
+and inferno read directly. Nothing runs between captures, so leaving it enabled is free.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter as _Tally
+from typing import Dict, Iterable, Tuple
+from urllib.parse import parse_qs
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+MAX_PROFILE_SECONDS = float(os.getenv("MAX_PROFILE_SECONDS", "60"))
+DEFAULT_HZ = 100
+MAX_HZ = 1000
+TRACEMALLOC_FRAMES = 32
+
+CPU_PATH = "/debug/profile/cpu"
+ALLOCATIONS_PATH = "/debug/profile/allocations"
+
+
+class ProfilerBusy(RuntimeError):
+    """Another capture is running; captures are serialized so they do not skew each other"""
+
+
+_capture_lock = threading.Lock()
+
+
+def _frame_label(filename: str, name: str, lineno: int) -> str:
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def _folded(stacks: Iterable[Tuple[Tuple[str, ...], int]]) -> str:
+    lines = [f"{';'.join(stack)} {weight}" for stack, weight in stacks if weight > 0]
+    lines.sort()
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def _clamp(seconds: float, hz: int = DEFAULT_HZ) -> Tuple[float, int]:
+    return max(0.1, min(float(seconds), MAX_PROFILE_SECONDS)), max(1, min(int(hz), MAX_HZ))
+
+
+def profile_cpu(seconds: float = 10.0, hz: int = DEFAULT_HZ) -> Tuple[str, Dict[str, float]]:
+    """
+    Sample all threads at `hz` for `seconds`; returns folded stacks rooted at the thread
+    name, weighted by sample count, and sampler stats. The sampler needs the GIL to take a
+    sample, so its mean lag behind schedule is a rough measure of GIL contention.
+    """
+    seconds, hz = _clamp(seconds, hz)
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already being captured")
+
+    try:
+        interval = 1.0 / hz
+        own = threading.get_ident()
+        labels: Dict[object, str] = {}
+        tally: _Tally = _Tally()
+        samples = 0
+        lag = 0.0
+
+        started = time.perf_counter()
+        deadline = started + seconds
+        scheduled = started
+        while scheduled < deadline:
+            now = time.perf_counter()
+            lag += max(0.0, now - scheduled)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code.co_filename, code.co_name, code.co_firstlineno)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                tally[tuple(reversed(stack))] += 1
+            samples += 1
+
+            scheduled += interval
+            pause = scheduled - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+            else:
+                scheduled = time.perf_counter()
+
+        elapsed = time.perf_counter() - started
+    finally:
+        _capture_lock.release()
+
+    stats = {
+        "seconds": round(elapsed, 3),
+        "samples": samples,
+        "hz": hz,
+        "mean_lag_ms": round(lag / samples * 1000, 3) if samples else 0.0
+    }
+    return _folded(tally.items()), stats
+
+
+def profile_allocations(seconds: float = 10.0, frames: int = TRACEMALLOC_FRAMES) -> Tuple[str, Dict[str, float]]:
+    """
+    Memory allocated during the window and still alive at its end, as folded stacks weighted
+    in bytes. tracemalloc is started for the window if it was not already running, and
+    slows every allocation while it is on.
+    """
+    seconds, _ = _clamp(seconds)
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already being captured")
+
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(frames)
+        # Leave out the snapshots' own allocations
+        ignore = (
+            tracemalloc.Filter(False, tracemalloc.__file__, all_frames=True),
+            tracemalloc.Filter(False, __file__, all_frames=True),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        )
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        traced, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _capture_lock.release()
+
+    stacks = []
+    grown = 0
+    for stat in after.compare_to(before, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        # tracemalloc keeps file:line only, oldest frame first
+        stack = tuple(f"{os.path.basename(f.filename)}:{f.lineno}" for f in stat.traceback)
+        stacks.append((stack, stat.size_diff))
+        grown += stat.size_diff
+
+    stats = {
+        "seconds": seconds,
+        "allocated_bytes": grown,
+        "traced_bytes": traced,
+        "peak_bytes": peak
+    }
+    return _folded(stacks), stats
+
+
+def handle_request(path: str) -> Tuple[int, str, Dict[str, str]]:
+    """
+    Serve CPU_PATH and ALLOCATIONS_PATH for plain HTTP servers; returns (status, body, headers).
+    Query parameters: seconds, and hz for CPU profiles.
+    """
+    route, _, query = path.partition("?")
+    if not PROFILING_ENABLED or route not in (CPU_PATH, ALLOCATIONS_PATH):
+        return 404, "not found\n", {}
+
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    try:
+        seconds = float(params.get("seconds", 10))
+        hz = int(params.get("hz", DEFAULT_HZ))
+    except ValueError:
+        return 400, "seconds and hz must be numbers\n", {}
+
+    try:
+        if route == CPU_PATH:
+            folded, stats = profile_cpu(seconds, hz)
+        else:
+            folded, stats = profile_allocations(seconds)
+    except ProfilerBusy as e:
+        return 409, f"{e}\n", {}
+
+    return 200, folded, stats_headers(stats)
+
+
+def stats_headers(stats: Dict[str, float]) -> Dict[str, str]:
+    return {f"X-Profile-{key.replace('_', '-').title()}": str(value) for key, value in stats.items()}